@@ -0,0 +1,10 @@
+"""PyBoard emulator.
+
+Run a firmware script on the emulator with:
+
+    python -m pybolator script.py
+
+The runner installs ``pybolator.pyboard`` as the ``pyb`` module. The
+tooling modules (``stimulus``, ``tracing``, ``harness``, ...) import it
+relative to the package, so firmware and tooling share one emulator.
+"""
@@ -0,0 +1,7 @@
+"""Entry point of ``python -m pybolator``."""
+
+import sys
+
+from .runner import main
+
+sys.exit(main())
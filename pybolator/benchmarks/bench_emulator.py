@@ -0,0 +1,294 @@
+"""Micro-benchmarks of the emulator hot paths.
+
+Description:
+    Times the peripheral operations firmware scripts use most (LCD
+    drawing, pin and LED toggling, timed ADC reads, I2C scans, UART
+    throughput) and full runs of the firmware test scripts. Every
+    benchmark runs on a fresh board; the best of several repeats is
+    kept, as seconds per operation.
+
+    Results can be saved as a JSON baseline and later runs compared to
+    it: the run fails when a benchmark got slower than the baseline by
+    more than the threshold. Baselines depend on the machine, record
+    them on the machine the comparison runs on.
+
+Usage:
+    python pybolator/benchmarks/bench_emulator.py --save baseline.json
+    python pybolator/benchmarks/bench_emulator.py --compare baseline.json \\
+        [--threshold 0.25] [--filter lcd]
+
+"""
+
+# ======================================================================
+# ========================= Import Statements ==========================
+# ======================================================================
+
+# # Built-in Imports:
+import argparse
+import glob
+import json
+import os
+import sys
+from array import array
+from time import perf_counter
+
+PACKAGE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(PACKAGE))
+
+# # Package Imports:
+from pybolator import pyboard
+from pybolator.harness import PASS, run_script
+
+# ======================================================================
+# ============================= Benchmarks =============================
+# ======================================================================
+
+# name -> factory. A factory sets up the peripherals on the current
+# board and returns (run, operations): run() performs the operations.
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a benchmark factory under a name."""
+    def register(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+
+@benchmark('lcd.fill')
+def bench_lcd_fill():
+    lcd = pyboard.LCD('X')
+
+    def run():
+        for _ in range(1000):
+            lcd.fill(1)
+            lcd.fill(0)
+    return run, 2000
+
+
+@benchmark('lcd.pixel')
+def bench_lcd_pixel():
+    lcd = pyboard.LCD('X')
+
+    def run():
+        pixel = lcd.pixel
+        for y in range(32):
+            for x in range(128):
+                pixel(x, y, 1)
+    return run, 128 * 32
+
+
+@benchmark('lcd.show')
+def bench_lcd_show():
+    lcd = pyboard.LCD('X')
+
+    def run():
+        for i in range(1000):
+            lcd.pixel(i % 128, i % 32, 1)
+            lcd.show()
+    return run, 1000
+
+
+@benchmark('lcd.text')
+def bench_lcd_text():
+    lcd = pyboard.LCD('X')
+
+    def run():
+        for i in range(100):
+            lcd.text('Hello world!', 0, (i % 4) * 8, 1)
+    return run, 100
+
+
+@benchmark('capture.show')
+def bench_capture_show():
+    from pybolator.capture import FrameStore
+    lcd = pyboard.LCD('X')
+    store = FrameStore(lcd, dedup=False)
+
+    def run():
+        for i in range(1000):
+            lcd.fill(0)
+            lcd.pixel(i % 128, i % 32, 1)
+            lcd.show()
+        store.clear()
+    return run, 1000
+
+
+@benchmark('pin.value')
+def bench_pin_value():
+    pin = pyboard.Pin('X1')
+
+    def run():
+        value = pin.value
+        for i in range(100000):
+            value(i & 1)
+    return run, 100000
+
+
+@benchmark('led.toggle')
+def bench_led_toggle():
+    led = pyboard.LED(1)
+
+    def run():
+        toggle = led.toggle
+        for _ in range(100000):
+            toggle()
+    return run, 100000
+
+
+@benchmark('adc.read_timed')
+def bench_adc_read_timed():
+    adc = pyboard.ADC('X1')
+    timer = pyboard.Timer(6, freq=100000)
+    buf = array('H', bytes(2 * 65536))
+
+    def run():
+        for _ in range(10):
+            adc.read_timed(buf, timer)
+    return run, 10 * 65536
+
+
+@benchmark('i2c.scan')
+def bench_i2c_scan():
+    i2c = pyboard.I2C(1, pyboard.I2C.MASTER)
+    for addr in (0x20, 0x3c, 0x50, 0x68):
+        i2c.attach(addr, pyboard.I2CDevice())
+
+    def run():
+        for _ in range(1000):
+            i2c.scan()
+    return run, 1000
+
+
+@benchmark('uart.write')
+def bench_uart_write():
+    uart = pyboard.UART(1, 115200)
+    data = bytes(range(256)) * 16
+
+    def run():
+        for _ in range(100):
+            uart.write(data)
+            uart.drain()
+    return run, 100 * len(data)
+
+
+@benchmark('uart.read')
+def bench_uart_read():
+    uart = pyboard.UART(1, 115200, timeout=10, read_buf_len=4096)
+    data = bytes(range(256)) * 16
+
+    def run():
+        for _ in range(100):
+            uart.feed(data)
+            uart.read(len(data))
+    return run, 100 * len(data)
+
+
+@benchmark('uart.readline')
+def bench_uart_readline():
+    uart = pyboard.UART(1, 115200, timeout=10, read_buf_len=4096)
+    lines = b'$GPGGA,123519,4807.038,N,01131.000,E*47\n' * 100
+
+    def run():
+        for _ in range(100):
+            uart.feed(lines)
+            for _ in range(100):
+                uart.readline()
+    return run, 100 * 100
+
+
+def script_benchmarks(directory=os.path.join(PACKAGE, 'tests')):
+    """Register a full run benchmark of every passing test script."""
+    for script in sorted(glob.glob(os.path.join(directory, 'test_*.py'))):
+        name = 'script.' + os.path.splitext(os.path.basename(script))[0]
+
+        def factory(script=script):
+            def run():
+                result = run_script(script, wall_limit=2.0)
+                if result.status != PASS:
+                    raise Exception('{}: {}'.format(
+                        result.status,
+                        result.reason.strip().splitlines()[-1]))
+            return run, 1
+        BENCHMARKS[name] = factory
+
+
+# ======================================================================
+# ============================= Functions ==============================
+# ======================================================================
+
+
+def measure(factory, repeat=5):
+    """Return the best time per operation of a benchmark in seconds."""
+    best = None
+    for _ in range(repeat):
+        with pyboard.Board():
+            run, operations = factory()
+            start = perf_counter()
+            run()
+            elapsed = (perf_counter() - start) / operations
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the emulator hot paths.')
+    parser.add_argument('--save', metavar='FILE',
+                        help='save the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare the results to a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed slowdown relative to the baseline '
+                             '(default: 0.25, i.e. 25%%)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--filter', default='',
+                        help='only run benchmarks whose name contains '
+                             'this')
+    parser.add_argument('--no-scripts', action='store_true',
+                        help='skip the test script runs')
+    options = parser.parse_args(argv)
+
+    if not options.no_scripts:
+        script_benchmarks()
+
+    baseline = {}
+    if options.compare is not None:
+        with open(options.compare) as stream:
+            baseline = json.load(stream)
+
+    results = {}
+    regressions = []
+    for name, factory in BENCHMARKS.items():
+        if options.filter not in name:
+            continue
+        try:
+            results[name] = measure(factory, options.repeat)
+        except Exception as error:
+            print('{:28} skipped: {}'.format(name, error))
+            continue
+
+        line = '{:28} {:12.3f} us'.format(name, results[name] * 1e6)
+        if name in baseline:
+            change = results[name] / baseline[name] - 1
+            line += '  {:+7.1%}'.format(change)
+            if change > options.threshold:
+                regressions.append(name)
+                line += '  REGRESSION'
+        print(line)
+
+    if options.save is not None:
+        with open(options.save, 'w') as stream:
+            json.dump(results, stream, indent=1, sort_keys=True)
+
+    if regressions:
+        print('{} benchmark(s) regressed by more than {:.0%}: {}'.format(
+            len(regressions), options.threshold, ', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Import time benchmark of the emulator.
+
+Description:
+    Measures the cold start cost of importing ``pybolator.pyboard`` in fresh
+    interpreter processes, as paid by every run of the headless runner.
+    The time of an interpreter doing nothing is subtracted.
+
+Usage:
+    python pybolator/benchmarks/bench_import.py [--runs 20] [--max-ms 30]
+
+    Exits with status 1 if the median import time exceeds --max-ms.
+
+"""
+
+# ======================================================================
+# ========================= Import Statements ==========================
+# ======================================================================
+
+# # Built-in Imports:
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# ======================================================================
+# ============================= Functions ==============================
+# ======================================================================
+
+PACKAGE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def startup_times(code, runs):
+    """Return the wall times in ms of ``runs`` interpreters running code."""
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(PACKAGE))
+    # Write the bytecode cache once, such that only the cold start of
+    # the interpreter and the module execution is measured.
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    command = [sys.executable, '-c', code]
+    subprocess.run(command, env=env, check=True)
+
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='fail if the median import time is larger')
+    options = parser.parse_args(argv)
+
+    baseline = statistics.median(startup_times('pass', options.runs))
+    imported = statistics.median(
+        startup_times('from pybolator import pyboard', options.runs))
+    cost = imported - baseline
+
+    print('interpreter startup: {:8.2f} ms'.format(baseline))
+    print('with import pyboard: {:8.2f} ms'.format(imported))
+    print('import pyboard:      {:8.2f} ms'.format(cost))
+
+    if options.max_ms is not None and cost > options.max_ms:
+        print('Import time exceeds {} ms.'.format(options.max_ms))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
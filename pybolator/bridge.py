@@ -0,0 +1,262 @@
+"""Asyncio bridge between emulated UARTs and host side tooling.
+
+Description:
+    Attaches an emulated ``UART`` to a pseudo-terminal or to a local
+    (TCP or Unix) socket, such that host programs (modem simulators,
+    protocol test benches, terminal programs) can talk to the firmware
+    as if it was connected to a real serial port.
+
+    All ports are served by one asyncio event loop. Data is moved in
+    batches: bytes from the host are fed to the RX line of the UART and
+    the transmitted bytes are drained from its TX buffer. Reading from
+    the host pauses while too many fed bytes did not arrive in the
+    emulated UART yet, and draining pauses while the host does not
+    accept more data. While a host is connected no transmitted byte is
+    dropped: ``UART.write`` waits until the bridge drained enough of
+    the TX buffer.
+
+Usage:
+    uart = pyb.UART(1, 115200)
+
+    loop = BridgeLoop()
+    path = loop.run(UARTBridge(uart).open_pty())
+    # connect a host program to ``path``, then run the firmware
+
+"""
+
+# ======================================================================
+# ========================= Import Statements ==========================
+# ======================================================================
+
+# # Built-in Imports:
+import asyncio
+import os
+import threading
+import tty
+
+# ======================================================================
+# ============================== Classes ===============================
+# ======================================================================
+
+
+class _PipeWriter(asyncio.Protocol):
+    """Write end of a pipe with the writer interface the bridge uses.
+
+    ``drain`` waits while the transport has paused writing because the
+    host does not read fast enough.
+    """
+
+    def __init__(self):
+        self._transport = None
+        self._paused = False
+        self._waiter = None
+        self._lost = None
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def connection_lost(self, exc):
+        self._lost = exc if exc is not None else \
+            ConnectionResetError('Pipe closed.')
+        self._wake()
+
+    def pause_writing(self):
+        self._paused = True
+
+    def resume_writing(self):
+        self._paused = False
+        self._wake()
+
+    def _wake(self):
+        waiter, self._waiter = self._waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def write(self, data):
+        self._transport.write(data)
+
+    async def drain(self):
+        """Wait until the pipe accepts more data."""
+        if self._lost is None and self._paused:
+            self._waiter = asyncio.get_running_loop().create_future()
+            await self._waiter
+        if self._lost is not None:
+            raise self._lost
+
+    def close(self):
+        self._transport.close()
+
+
+class UARTBridge:
+    """Connects one emulated UART to a host side stream."""
+
+    def __init__(self, uart, chunk_size=4096, rx_limit=4096,
+                 poll_interval=0.001):
+        """
+
+        Parameters
+        ----------
+        uart: UART
+            The emulated UART.
+        chunk_size: int
+            Maximum number of bytes moved at once.
+        rx_limit: int
+            Reading from the host pauses while at least this many fed
+            bytes did not arrive in the UART yet.
+        poll_interval: float
+            Seconds to sleep when there is nothing to transfer.
+        """
+        self.uart = uart
+        self.chunk_size = chunk_size
+        self.rx_limit = rx_limit
+        self.poll_interval = poll_interval
+
+        self._tasks = []
+        self._server = None
+        self._pty = None
+        self._pty_transport = None
+
+    # ------------------------------------------------------------------
+    # Endpoints
+    # ------------------------------------------------------------------
+
+    async def open_pty(self):
+        """Attach the UART to a new pseudo-terminal.
+
+        Returns
+        -------
+        out: str
+            Path of the terminal device host programs should open.
+        """
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        os.set_blocking(master, False)
+        self._pty = (master, slave)
+
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=self.chunk_size)
+        self._pty_transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader),
+            os.fdopen(master, 'rb', buffering=0, closefd=False))
+        _, writer = await loop.connect_write_pipe(
+            _PipeWriter, os.fdopen(os.dup(master), 'wb', buffering=0))
+
+        self._start(reader, writer)
+        return os.ttyname(slave)
+
+    async def serve_tcp(self, host='127.0.0.1', port=0):
+        """Accept one host connection at a time on a TCP socket.
+
+        Returns
+        -------
+        out: tuple
+            The (host, port) the server listens on.
+        """
+        self._server = await asyncio.start_server(
+            self._connected, host, port, limit=self.chunk_size)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_unix(self, path):
+        """Accept one host connection at a time on a Unix socket.
+
+        Returns
+        -------
+        out: str
+            The path of the socket.
+        """
+        self._server = await asyncio.start_unix_server(
+            self._connected, path, limit=self.chunk_size)
+        return path
+
+    async def close(self):
+        """Stop transferring and close the endpoints."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.uart.set_tx_flow(False)
+
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._pty_transport is not None:
+            # Stop watching the terminal before its fd is closed.
+            self._pty_transport.close()
+            self._pty_transport = None
+        if self._pty is not None:
+            for fd in self._pty:
+                os.close(fd)
+            self._pty = None
+
+    # ------------------------------------------------------------------
+    # Transfers
+    # ------------------------------------------------------------------
+
+    async def _connected(self, reader, writer):
+        for task in self._tasks:
+            task.cancel()
+        self._start(reader, writer)
+
+    def _start(self, reader, writer):
+        self.uart.set_tx_flow(True)
+        self._tasks = [
+            asyncio.ensure_future(self._host_to_uart(reader)),
+            asyncio.ensure_future(self._uart_to_host(writer)),
+        ]
+
+    async def _host_to_uart(self, reader):
+        uart = self.uart
+        while True:
+            while uart.pending() >= self.rx_limit:
+                await asyncio.sleep(self.poll_interval)
+
+            try:
+                data = await reader.read(self.chunk_size)
+            except OSError:
+                # The host closed the terminal.
+                data = b''
+            if not data:
+                return
+            uart.feed(data)
+
+    async def _uart_to_host(self, writer):
+        uart = self.uart
+        try:
+            while True:
+                data = uart.drain(self.chunk_size)
+                if not data:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            # The host is gone: let the firmware write freely again.
+            self.uart.set_tx_flow(False)
+        finally:
+            writer.close()
+
+
+class BridgeLoop:
+    """Event loop running all bridges in one background thread.
+
+    The firmware script keeps running in the calling thread.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name='pybolator-bridge',
+            daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine):
+        """Run a coroutine on the bridge loop and return its result."""
+        return asyncio.run_coroutine_threadsafe(
+            coroutine, self._loop).result()
+
+    def stop(self):
+        """Stop the loop and wait for the thread to finish."""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
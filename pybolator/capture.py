@@ -0,0 +1,542 @@
+"""Capture of LCD frames, image export and golden image comparison.
+
+Description:
+    A FrameStore watches an emulated ``LCD`` and records the screen at
+    every ``show`` with its simulated time. Frames are kept packed at one
+    bit per pixel, and every distinct image is stored once (compressed),
+    so animations of tens of thousands of frames take little memory:
+    a frame showing an image seen before only costs its time and index.
+
+    Frames export to PBM (P4) and PNG (1 bit grayscale) using only the
+    standard library, and compare to golden images (PBM or PNG) with a
+    report of the differing pixels, for screenshot regression tests.
+
+Usage:
+    lcd = pyb.LCD('X')
+    store = FrameStore(lcd)
+    # run the firmware
+    store.last().save('screen.png')
+    assert_matches(store.last(), 'golden/screen.png')
+
+"""
+
+# ======================================================================
+# ========================= Import Statements ==========================
+# ======================================================================
+
+# # Built-in Imports:
+import hashlib
+import os
+import struct
+import zlib
+from array import array
+
+# ======================================================================
+# ============================= Functions ==============================
+# ======================================================================
+
+# Pixel bytes (0 or 1) to the digits of a binary number
+_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+
+
+def pack(pixels, width, height):
+    """Pack byte-per-pixel rows to one bit per pixel.
+
+    Rows are packed most significant bit first and padded to whole
+    bytes, as in PBM files: 1 is a set (dark) pixel.
+    """
+    digits = bytes(pixels).translate(_DIGITS)
+    padding = -width % 8
+    if padding:
+        pad = b'0' * padding
+        digits = b''.join(
+            digits[y * width:(y + 1) * width] + pad for y in range(height))
+    if not digits:
+        return b''
+    return int(digits, 2).to_bytes(len(digits) // 8, 'big')
+
+
+def _count_bits(value):
+    return bin(value).count('1')
+
+
+# ======================================================================
+# ============================== Classes ===============================
+# ======================================================================
+
+
+class Frame:
+    """One captured image of the screen."""
+
+    def __init__(self, width, height, data, time_us=0):
+        """
+
+        Parameters
+        ----------
+        width: int
+        height: int
+        data: bytes
+            The packed pixels, see ``pack``.
+        time_us: int
+            Simulated time the frame was shown at.
+        """
+        self.width = width
+        self.height = height
+        self.data = data
+        self.time_us = time_us
+
+    @classmethod
+    def from_lcd(cls, lcd, time_us=0):
+        """Return the visible screen of an LCD as a Frame."""
+        return cls(lcd._x, lcd._y, pack(lcd._buffer, lcd._x, lcd._y),
+                   time_us)
+
+    @property
+    def stride(self):
+        """Bytes per packed row."""
+        return (self.width + 7) // 8
+
+    def pixel(self, x, y):
+        """Return the pixel at (x, y), 0 or 1."""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return 0
+        byte = self.data[y * self.stride + x // 8]
+        return (byte >> (7 - x % 8)) & 1
+
+    def __eq__(self, other):
+        if not isinstance(other, Frame):
+            return NotImplemented
+        return (self.width, self.height, self.data) == \
+            (other.width, other.height, other.data)
+
+    def __repr__(self):
+        return 'Frame({}x{} at {} us)'.format(
+            self.width, self.height, self.time_us)
+
+    def to_pbm(self):
+        """Return the frame as a binary PBM (P4) image."""
+        header = 'P4\n{} {}\n'.format(self.width, self.height)
+        return header.encode('ascii') + self.data
+
+    def to_png(self):
+        """Return the frame as a 1 bit grayscale PNG image.
+
+        Set pixels are black on white, as on the pyboard LCD.
+        """
+        # PNG grayscale has 0 for black: invert the packed bits
+        size = len(self.data)
+        if size:
+            inverted = (int.from_bytes(self.data, 'big')
+                        ^ ((1 << 8 * size) - 1)).to_bytes(size, 'big')
+        else:
+            inverted = b''
+        stride = self.stride
+        raw = b''.join(b'\x00' + inverted[y * stride:(y + 1) * stride]
+                       for y in range(self.height))
+
+        def chunk(kind, body):
+            return (struct.pack('>I', len(body)) + kind + body
+                    + struct.pack('>I', zlib.crc32(kind + body)))
+
+        return (b'\x89PNG\r\n\x1a\n'
+                + chunk(b'IHDR', struct.pack('>IIBBBBB', self.width,
+                                             self.height, 1, 0, 0, 0, 0))
+                + chunk(b'IDAT', zlib.compress(raw, 6))
+                + chunk(b'IEND', b''))
+
+    def save(self, path):
+        """Write the frame to a .png or .pbm file."""
+        if path.lower().endswith('.png'):
+            data = self.to_png()
+        else:
+            data = self.to_pbm()
+        with open(path, 'wb') as stream:
+            stream.write(data)
+
+
+class FrameStore:
+    """Records the frames an LCD shows.
+
+    Every distinct image is stored once, compressed; the frames are kept
+    as arrays of times and image indexes.
+    """
+
+    def __init__(self, lcd=None, dedup=True, compress=True):
+        """
+
+        Parameters
+        ----------
+        lcd: LCD, optional
+            Start capturing this LCD right away.
+        dedup: bool
+            Skip the frames identical to the previous frame, i.e. only
+            record when the screen changes.
+        compress: bool
+            Compress the stored images (a little slower to capture new
+            images, much less memory).
+        """
+        self.dedup = dedup
+        self.compress = compress
+
+        self.times = array('q')
+        self.indexes = array('L')
+        self.dropped = 0
+
+        self._images = []
+        self._index = {}
+        self._lcd = None
+        # Packed screen of the LCD, updated with the changed rows only
+        self._screen = None
+        self._size = None
+        if lcd is not None:
+            self.attach(lcd)
+
+    def attach(self, lcd):
+        """Capture every ``show`` of an LCD."""
+        self.detach()
+        self._lcd = lcd
+        self._screen = None
+        lcd.watch(self._capture)
+
+    def detach(self):
+        """Stop capturing."""
+        if self._lcd is not None:
+            self._lcd.unwatch(self._capture)
+            self._lcd = None
+
+    def _capture(self, lcd, rows):
+        if self.dedup and not rows and self._screen is not None \
+                and self.times:
+            self.dropped += 1
+            return
+
+        width, height = lcd._x, lcd._y
+        if self._screen is None or self._size != (width, height):
+            self._screen = bytearray(pack(lcd._buffer, width, height))
+            self._size = (width, height)
+        else:
+            stride = (width + 7) // 8
+            buffer = lcd._buffer
+            screen = self._screen
+            for y in rows:
+                screen[y * stride:(y + 1) * stride] = pack(
+                    buffer[y * width:(y + 1) * width], width, 1)
+        self.add(Frame(width, height, bytes(self._screen),
+                       lcd._board.clock.micros()))
+
+    def add(self, frame):
+        """Append a frame to the store."""
+        # Images are looked up by digest, so that they are not kept
+        # uncompressed as keys; a hit is checked against the image.
+        key = hashlib.blake2b(frame.data, digest_size=16).digest()
+        index = self._index.get(key)
+        if index is not None and (
+                self._images[index][:2] != (frame.width, frame.height)
+                or self._image(index) != frame.data):
+            index = None
+        if index is None:
+            index = len(self._images)
+            data = frame.data
+            if self.compress:
+                data = zlib.compress(data, 1)
+            self._images.append((frame.width, frame.height, data))
+            self._index.setdefault(key, index)
+        self.times.append(frame.time_us)
+        self.indexes.append(index)
+
+    def __len__(self):
+        return len(self.times)
+
+    def _image(self, index):
+        data = self._images[index][2]
+        if self.compress:
+            data = zlib.decompress(data)
+        return data
+
+    def __getitem__(self, number):
+        index = self.indexes[number]
+        width, height, _ = self._images[index]
+        return Frame(width, height, self._image(index), self.times[number])
+
+    def __iter__(self):
+        for number in range(len(self)):
+            yield self[number]
+
+    def last(self):
+        """Return the last frame, None if there is none."""
+        return self[-1] if self.times else None
+
+    def images(self):
+        """Return the number of distinct images."""
+        return len(self._images)
+
+    def clear(self):
+        """Forget all frames."""
+        del self.times[:]
+        del self.indexes[:]
+        self._images = []
+        self._index = {}
+        self.dropped = 0
+
+    def export(self, directory, extension='png', distinct=False):
+        """Write the frames as numbered image files.
+
+        Parameters
+        ----------
+        directory: str
+        extension: str
+            'png' or 'pbm'.
+        distinct: bool
+            Write every distinct image once instead of every frame.
+
+        Returns
+        -------
+        out: list
+            The paths written.
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        if distinct:
+            numbers = []
+            seen = set()
+            for number, index in enumerate(self.indexes):
+                if index not in seen:
+                    seen.add(index)
+                    numbers.append(number)
+        else:
+            numbers = range(len(self))
+
+        encoded = {}
+        for number in numbers:
+            index = self.indexes[number]
+            data = encoded.get(index)
+            if data is None:
+                frame = self[number]
+                data = frame.to_png() if extension == 'png' else \
+                    frame.to_pbm()
+                encoded[index] = data
+            path = os.path.join(directory, 'frame_{:06d}.{}'.format(
+                number, extension))
+            with open(path, 'wb') as stream:
+                stream.write(data)
+            paths.append(path)
+        return paths
+
+
+class Diff:
+    """Pixel difference between a frame and a golden image."""
+
+    def __init__(self, frame, golden):
+        if (frame.width, frame.height) != (golden.width, golden.height):
+            raise Exception(
+                "Frame is {}x{} pixels but the golden image is {}x{}."
+                .format(frame.width, frame.height, golden.width,
+                        golden.height))
+        self.frame = frame
+        self.golden = golden
+        self._mask = (int.from_bytes(frame.data, 'big')
+                      ^ int.from_bytes(golden.data, 'big'))
+        self.count = _count_bits(self._mask)
+
+    def __bool__(self):
+        return self.count != 0
+
+    def pixels(self, limit=None):
+        """Return the (x, y) positions of the differing pixels."""
+        positions = []
+        mask = self._mask
+        stride_bits = self.frame.stride * 8
+        total = len(self.frame.data) * 8
+        while mask and (limit is None or len(positions) < limit):
+            bit = mask.bit_length() - 1
+            mask ^= 1 << bit
+            position = total - 1 - bit
+            positions.append((position % stride_bits,
+                              position // stride_bits))
+        return positions
+
+    def image(self):
+        """Return a Frame with the differing pixels set."""
+        size = len(self.frame.data)
+        return Frame(self.frame.width, self.frame.height,
+                     self._mask.to_bytes(size, 'big'), self.frame.time_us)
+
+    def __str__(self):
+        if not self.count:
+            return 'Frames are identical.'
+        shown = self.pixels(10)
+        text = '{} of {} pixels differ: {}'.format(
+            self.count, self.frame.width * self.frame.height,
+            ', '.join('({}, {})'.format(x, y) for x, y in shown))
+        if self.count > len(shown):
+            text += ', ...'
+        return text
+
+
+# ======================================================================
+# ========================== Golden images =============================
+# ======================================================================
+
+
+def load(path):
+    """Read a PBM (P1 or P4) or PNG image as a Frame.
+
+    PNG images may be grayscale, palette or RGB(A); pixels darker than
+    half intensity are set.
+    """
+    with open(path, 'rb') as stream:
+        data = stream.read()
+    if data.startswith(b'\x89PNG'):
+        return _load_png(data)
+    if data[:2] in (b'P1', b'P4'):
+        return _load_pbm(data)
+    raise Exception("{}: not a PBM or PNG image.".format(path))
+
+
+def _load_pbm(data):
+    # Header fields are separated by whitespace, with # comments
+    fields = []
+    position = 0
+    while len(fields) < 3:
+        while data[position:position + 1].isspace():
+            position += 1
+        if data[position:position + 1] == b'#':
+            position = data.index(b'\n', position)
+            continue
+        start = position
+        while not data[position:position + 1].isspace():
+            position += 1
+        fields.append(data[start:position])
+    kind, width, height = fields[0], int(fields[1]), int(fields[2])
+
+    if kind == b'P4':
+        size = (width + 7) // 8 * height
+        return Frame(width, height, data[position + 1:position + 1 + size])
+    digits = bytes(c for c in data[position:] if c in b'01')
+    pixels = digits[:width * height].translate(
+        bytes.maketrans(b'01', b'\x00\x01'))
+    return Frame(width, height, pack(pixels, width, height))
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def _load_png(data):
+    position = 8
+    idat = []
+    palette = None
+    while position < len(data):
+        length, kind = struct.unpack('>I4s', data[position:position + 8])
+        body = data[position + 8:position + 8 + length]
+        position += 12 + length
+        if kind == b'IHDR':
+            width, height, depth, colour, _, _, interlace = \
+                struct.unpack('>IIBBBBB', body)
+        elif kind == b'PLTE':
+            palette = body
+        elif kind == b'IDAT':
+            idat.append(body)
+        elif kind == b'IEND':
+            break
+    if interlace or depth == 16:
+        raise Exception("Interlaced and 16 bit PNG images are not "
+                        "supported.")
+
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}[colour]
+    bits = depth * channels
+    stride = (width * bits + 7) // 8
+    step = max(bits // 8, 1)
+    raw = zlib.decompress(b''.join(idat))
+
+    # Undo the row filters
+    rows = []
+    previous = bytearray(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        kind = raw[start]
+        row = bytearray(raw[start + 1:start + 1 + stride])
+        if kind == 1:
+            for i in range(step, stride):
+                row[i] = (row[i] + row[i - step]) & 0xff
+        elif kind == 2:
+            for i in range(stride):
+                row[i] = (row[i] + previous[i]) & 0xff
+        elif kind == 3:
+            for i in range(stride):
+                left = row[i - step] if i >= step else 0
+                row[i] = (row[i] + (left + previous[i]) // 2) & 0xff
+        elif kind == 4:
+            for i in range(stride):
+                left = row[i - step] if i >= step else 0
+                corner = previous[i - step] if i >= step else 0
+                row[i] = (row[i] + _paeth(left, previous[i], corner)) & 0xff
+        rows.append(row)
+        previous = row
+
+    # Gray level (0 to 255) of every pixel
+    pixels = bytearray(width * height)
+    maximum = (1 << depth) - 1
+    for y, row in enumerate(rows):
+        for x in range(width):
+            if depth < 8:
+                bit = x * depth
+                sample = (row[bit // 8] >> (8 - depth - bit % 8)) & maximum
+            else:
+                sample = row[x * channels]
+            if colour == 3:
+                red, green, blue = palette[3 * sample:3 * sample + 3]
+                level = (red + green + blue) // 3
+            elif colour in (2, 6):
+                offset = x * channels
+                level = sum(row[offset:offset + 3]) // 3
+            else:
+                level = sample * 255 // maximum
+            pixels[y * width + x] = level < 128
+    return Frame(width, height, pack(pixels, width, height))
+
+
+def compare(frame, golden):
+    """Compare a frame to a golden image.
+
+    Parameters
+    ----------
+    frame: Frame
+    golden: Frame or str
+        The golden Frame, or the path of a PBM or PNG image.
+
+    Returns
+    -------
+    out: Diff
+        False when the images are identical.
+    """
+    if isinstance(golden, str):
+        golden = load(golden)
+    return Diff(frame, golden)
+
+
+def assert_matches(frame, path, update=False):
+    """Check a frame against the golden image in path.
+
+    A missing golden image is created from the frame, as is an existing
+    one when update is True. On a mismatch the differing pixels are
+    saved next to the golden image (``<name>.diff.<ext>``) and an
+    AssertionError describing the difference is raised.
+    """
+    if update or not os.path.exists(path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        frame.save(path)
+        return
+
+    diff = compare(frame, path)
+    if diff:
+        name, extension = os.path.splitext(path)
+        diff_path = name + '.diff' + extension
+        diff.image().save(diff_path)
+        raise AssertionError('{}: {} (see {})'.format(path, diff, diff_path))
@@ -0,0 +1,216 @@
+"""Live terminal dashboard of a board.
+
+Description:
+    Shows the LEDs (state and intensity), the LCD contents and the pin
+    levels of a board in the terminal while a firmware script runs.
+
+    The dashboard runs in its own thread. At a capped frame rate it
+    takes a snapshot of the board state and redraws the terminal only
+    when the snapshot changed; the firmware thread never renders and is
+    never blocked by the dashboard. LCD rows are only converted to text
+    when they changed since the last snapshot.
+
+    When stdout is not a terminal (pipes, files, CI logs) the dashboard
+    does nothing.
+
+Usage:
+    with Dashboard(board, fps=10):
+        # run the firmware
+
+    python -m pybolator --dashboard main.py
+
+"""
+
+# ======================================================================
+# ========================= Import Statements ==========================
+# ======================================================================
+
+# # Built-in Imports:
+import shutil
+import sys
+import threading
+
+# # Package Imports:
+from .pyboard import LCD, LED, current_board
+
+# ======================================================================
+# ============================== Classes ===============================
+# ======================================================================
+
+# ANSI colour of the pyboard LEDs
+LED_COLOURS = {1: 31, 2: 32, 3: 33, 4: 34}
+
+# Two LCD pixel rows per terminal line: index top * 2 + bottom
+_BLOCKS = ' ▄▀█'
+_BLOCKS_ASCII = ' .\'#'
+
+
+class Dashboard:
+    """Redraws the state of a board in the terminal."""
+
+    def __init__(self, board=None, fps=10.0, stream=None):
+        """
+
+        Parameters
+        ----------
+        board: Board, optional
+            Defaults to the current board.
+        fps: float
+            Maximum number of redraws per second.
+        stream: file, optional
+            Terminal to draw on, defaults to sys.stdout.
+        """
+        self.board = board if board is not None else current_board()
+        self.fps = fps
+        self.stream = stream if stream is not None else sys.stdout
+
+        isatty = getattr(self.stream, 'isatty', None)
+        self.enabled = isatty is not None and isatty()
+        encoding = (getattr(self.stream, 'encoding', None) or '').lower()
+        self._blocks = _BLOCKS if encoding.startswith('utf') else \
+            _BLOCKS_ASCII
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._last = None
+        # id(lcd) -> [size, frame, text lines]
+        self._lcd_lines = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Start redrawing in a background thread (no-op without a TTY)."""
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        # Draw on the alternate screen, restored by stop
+        self.stream.write('\x1b[?1049h\x1b[?25l')
+        self._thread = threading.Thread(
+            target=self._run, name='pybolator-dashboard', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop redrawing and print the final state once."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.stream.write('\x1b[?25h\x1b[?1049l')
+        self.stream.write(self.render(self.snapshot()) + '\n')
+        self.stream.flush()
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        while not self._stop.wait(interval):
+            self.refresh()
+
+    def refresh(self):
+        """Redraw the terminal if the board state changed."""
+        snapshot = self.snapshot()
+        if snapshot == self._last:
+            return
+        self._last = snapshot
+        self.stream.write('\x1b[H' + self.render(snapshot).replace(
+            '\n', '\x1b[K\n') + '\x1b[K\x1b[J')
+        self.stream.flush()
+
+    # ------------------------------------------------------------------
+    # Snapshot
+    # ------------------------------------------------------------------
+
+    def snapshot(self):
+        """Return the board state as a tuple of plain values.
+
+        Reads the peripherals without calling their methods, so the
+        profile and event log of the script are not affected.
+        """
+        board = self.board
+        # One entry per LED colour, whatever objects the script made
+        leds = {}
+        lcds = []
+        for peripheral in list(board.peripherals):
+            if isinstance(peripheral, LED):
+                leds[peripheral._color] = peripheral._intensity
+            elif isinstance(peripheral, LCD):
+                lcds.append(self._lcd_snapshot(peripheral))
+
+        levels = dict(list(board.pin_levels.items()))
+        for name, pin in list(board.pin_objects.items()):
+            levels[name] = pin._pin_value
+        pins = tuple(sorted((name, 1 if level else 0)
+                            for name, level in levels.items()))
+        return (board.clock.micros(), tuple(sorted(leds.items())),
+                tuple(lcds), pins)
+
+    def _lcd_snapshot(self, lcd):
+        # Convert only the pixel rows which changed since the last
+        # snapshot, two rows per text line.
+        size = (lcd._x, lcd._y)
+        frame = lcd.frame
+        cache = self._lcd_lines.get(id(lcd))
+        if cache is None or cache[0] != size:
+            cache = [size, -1, [''] * ((lcd._y + 1) // 2)]
+            self._lcd_lines[id(lcd)] = cache
+            rows = range(lcd._y)
+        else:
+            rows = lcd.changed_rows(cache[1])
+        cache[1] = frame
+
+        lines = cache[2]
+        blocks = self._blocks
+        empty = bytes(lcd._x)
+        for index in sorted(set(y // 2 for y in rows)):
+            top = lcd.row(2 * index)
+            bottom = lcd.row(2 * index + 1) if 2 * index + 1 < lcd._y \
+                else empty
+            lines[index] = ''.join(
+                [blocks[2 * t + b] for t, b in zip(top, bottom)])
+        return tuple(lines)
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+
+    def render(self, snapshot):
+        """Return the text of a snapshot."""
+        time_us, leds, lcds, pins = snapshot
+        lines = ['pybolator  {:.6f} s'.format(time_us / 1000000)]
+
+        if leds:
+            cells = []
+            for colour, intensity in leds:
+                mark = '*' if intensity else '.'
+                cell = 'LED{} {} {:3}%'.format(colour, mark, intensity)
+                if intensity and colour in LED_COLOURS:
+                    cell = '\x1b[{}m{}\x1b[0m'.format(
+                        LED_COLOURS[colour], cell)
+                cells.append(cell)
+            lines.append('')
+            lines.append('   '.join(cells))
+
+        for text in lcds:
+            width = len(text[0]) if text else 0
+            lines.append('')
+            lines.append('+' + '-' * width + '+')
+            lines.extend('|' + line + '|' for line in text)
+            lines.append('+' + '-' * width + '+')
+
+        if pins:
+            columns = shutil.get_terminal_size().columns
+            lines.append('')
+            line = ''
+            for name, level in pins:
+                cell = '{:>4}:{} '.format(name, level)
+                if len(line) + len(cell) > columns:
+                    lines.append(line.rstrip())
+                    line = ''
+                line += cell
+            lines.append(line.rstrip())
+
+        return '\n'.join(lines)
@@ -0,0 +1,289 @@
+"""Parallel harness for firmware test scripts.
+
+Description:
+    Discovers firmware scripts (``test_*.py``) and runs each of them on
+    a fresh board in a pool of worker processes, one per core by
+    default. A script passes when it runs to its end, fails when it
+    raises and times out when it exceeds its simulated time limit (e.g.
+    waits forever with ``pyb.delay``) or its wall time limit (e.g.
+    spins in ``while True: pass``).
+
+    Every script runs in a new worker process, so whatever a script
+    changes (e.g. ``pyb.delay = ...`` or the modules it imports) cannot
+    leak into the next one. Workers are forked from a server process
+    which imported the emulator once, which keeps this cheap. With
+    ``--reuse-workers`` a worker runs several scripts, faster but only
+    isolated by the new board each script gets.
+
+Usage:
+    python -m pybolator.harness [options] pybolator/tests
+
+    Exits with status 1 if any script did not pass.
+
+"""
+
+# ======================================================================
+# ========================= Import Statements ==========================
+# ======================================================================
+
+# # Built-in Imports:
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+
+# # Package Imports:
+from . import pyboard, runner
+
+# ======================================================================
+# ============================== Classes ===============================
+# ======================================================================
+
+PASS = 'pass'
+FAIL = 'fail'
+TIMEOUT = 'timeout'
+
+
+class WallTimeLimitExceeded(BaseException):
+    """The script ran longer than its wall time limit.
+
+    A BaseException, as pyboard.TimeLimitExceeded, so that the script
+    cannot catch it by accident.
+    """
+
+
+class Result:
+    """Outcome of one script run."""
+
+    def __init__(self, script, status, reason=None, sim_us=0, wall_s=0.0,
+                 output='', trace=None):
+        """
+
+        Parameters
+        ----------
+        script: str
+        status: str
+            PASS, FAIL or TIMEOUT.
+        reason: str, optional
+            Traceback of a failure, or the exceeded limit.
+        sim_us: int
+            Simulated time at the end of the run.
+        wall_s: float
+            Wall time of the run.
+        output: str
+            What the script printed (stdout and stderr).
+        trace: str, optional
+            Directory of the trace of the run.
+        """
+        self.script = script
+        self.status = status
+        self.reason = reason
+        self.sim_us = sim_us
+        self.wall_s = wall_s
+        self.output = output
+        self.trace = trace
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+# ======================================================================
+# ============================= Functions ==============================
+# ======================================================================
+
+
+def discover(paths, pattern='test_'):
+    """Return the firmware scripts in the given files and directories.
+
+    Directories are searched recursively for ``<pattern>*.py`` files.
+    """
+    scripts = []
+    for path in paths:
+        if os.path.isfile(path):
+            scripts.append(path)
+            continue
+        for directory, subdirectories, filenames in os.walk(path):
+            subdirectories.sort()
+            for filename in sorted(filenames):
+                if filename.startswith(pattern) and filename.endswith('.py'):
+                    scripts.append(os.path.join(directory, filename))
+    return scripts
+
+
+def _wall_time_exceeded(signum, frame):
+    raise WallTimeLimitExceeded("Wall time limit reached.")
+
+
+def run_script(script, time_limit=600.0, wall_limit=10.0, seed=0,
+               trace=None):
+    """Run one script on a fresh board and return its Result.
+
+    Must run in the main thread of its process (the wall time limit is
+    an interval timer signal).
+    """
+    board = pyboard.Board(seed=seed)
+    output = io.StringIO()
+    status, reason = PASS, None
+
+    previous = signal.signal(signal.SIGALRM, _wall_time_exceeded)
+    signal.setitimer(signal.ITIMER_REAL, wall_limit)
+    start = perf_counter()
+    try:
+        with contextlib.redirect_stdout(output), \
+                contextlib.redirect_stderr(output):
+            runner.run(script, board=board, trace=trace,
+                       time_limit=time_limit)
+    except (pyboard.TimeLimitExceeded, WallTimeLimitExceeded) as error:
+        status, reason = TIMEOUT, str(error)
+    except SystemExit as error:
+        if error.code not in (None, 0):
+            status, reason = FAIL, 'SystemExit({!r})'.format(error.code)
+    except BaseException:
+        status, reason = FAIL, traceback.format_exc()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+    return Result(script, status, reason,
+                  sim_us=board.clock.micros(),
+                  wall_s=perf_counter() - start,
+                  output=output.getvalue(), trace=trace)
+
+
+def _isolated_context():
+    """Return the multiprocessing context of single-use workers."""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # Workers fork from a server which imported the emulator once
+        context.set_forkserver_preload([runner.__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def run_all(scripts, jobs=None, time_limit=600.0, wall_limit=10.0, seed=0,
+            trace_dir=None, report=None, reuse_workers=False):
+    """Run the scripts in parallel.
+
+    Parameters
+    ----------
+    scripts: list
+    jobs: int, optional
+        Number of worker processes. Defaults to the number of cores.
+    time_limit: float
+        Simulated seconds each script may run.
+    wall_limit: float
+        Wall clock seconds each script may run.
+    seed: int
+        Seed of the boards.
+    trace_dir: str, optional
+        Record the trace of every script into a subdirectory of it.
+    report: callable, optional
+        Called with each Result as soon as it is available.
+    reuse_workers: bool
+        Run several scripts per worker process. Faster, but changes a
+        script makes to shared modules leak into later scripts.
+
+    Returns
+    -------
+    out: list
+        The Results, in the order of the scripts.
+    """
+    results = {}
+    if reuse_workers:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=jobs, mp_context=_isolated_context(),
+            max_tasks_per_child=1)
+    with executor:
+        futures = {}
+        for script in scripts:
+            trace = None
+            if trace_dir is not None:
+                name = os.path.splitext(os.path.normpath(script))[0]
+                trace = os.path.join(trace_dir, name.replace(os.sep, '_'))
+            future = executor.submit(
+                run_script, script, time_limit, wall_limit, seed, trace)
+            futures[future] = script
+
+        for future in as_completed(futures):
+            script = futures[future]
+            try:
+                result = future.result()
+            except Exception:
+                # The worker died, e.g. the script killed its process.
+                result = Result(script, FAIL, traceback.format_exc())
+            results[script] = result
+            if report is not None:
+                report(result)
+
+    return [results[script] for script in scripts]
+
+
+def _print_result(result):
+    print('{:8} {} ({:.3f} s simulated, {:.3f} s)'.format(
+        result.status.upper(), result.script, result.sim_us / 1000000,
+        result.wall_s))
+    if result.status == FAIL:
+        print('    ' + result.reason.rstrip().replace('\n', '\n    '))
+
+
+def main(argv=None):
+    """Command line entry point, returns the exit status."""
+    parser = argparse.ArgumentParser(
+        description='Run firmware test scripts in parallel on the '
+                    'emulator.')
+    parser.add_argument('paths', nargs='+',
+                        help='scripts, or directories with test_*.py '
+                             'scripts')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--time-limit', type=float, default=600.0,
+                        metavar='SECONDS',
+                        help='simulated time limit per script '
+                             '(default: 600)')
+    parser.add_argument('--wall-limit', type=float, default=10.0,
+                        metavar='SECONDS',
+                        help='wall time limit per script (default: 10)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace-dir', metavar='DIR',
+                        help='record a trace of every script')
+    parser.add_argument('--json', metavar='FILE',
+                        help='write the results to a JSON file')
+    parser.add_argument('--reuse-workers', action='store_true',
+                        help='run several scripts per worker process '
+                             '(faster, less isolated)')
+    options = parser.parse_args(argv)
+
+    scripts = discover(options.paths)
+    start = perf_counter()
+    results = run_all(scripts, jobs=options.jobs,
+                      time_limit=options.time_limit,
+                      wall_limit=options.wall_limit, seed=options.seed,
+                      trace_dir=options.trace_dir, report=_print_result,
+                      reuse_workers=options.reuse_workers)
+    elapsed = perf_counter() - start
+
+    counts = {status: 0 for status in (PASS, FAIL, TIMEOUT)}
+    for result in results:
+        counts[result.status] += 1
+    print('{} passed, {} failed, {} timed out in {:.2f} s'.format(
+        counts[PASS], counts[FAIL], counts[TIMEOUT], elapsed))
+
+    if options.json is not None:
+        with open(options.json, 'w') as stream:
+            json.dump([result.as_dict() for result in results], stream,
+                      indent=1)
+
+    return 0 if counts[PASS] == len(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +0,0 @@
-__name__ = "pyb-mock"
-
-from pyboard import *
@@ -29,11 +29,19 @@ ToDo:
 
 # # Built-in Imports:
 import sys
-from time import sleep
-from random import randint
+import errno
+import math
+import threading
+import zlib
+from array import array
+from collections import deque
+from bisect import bisect_left, bisect_right
+from heapq import heappop, heappush
+from itertools import count
+from time import sleep, perf_counter
+from random import Random
 
 # # Third party imports:
-from unittest.mock import Mock
 # from datetime import datetime
 
 # ======================================================================
@@ -41,76 +49,1053 @@ from unittest.mock import Mock
 # ======================================================================
 
 
+# ======================================================================
+# ========================== Simulated clock ===========================
+# ======================================================================
+
+class TimeLimitExceeded(BaseException):
+    """The simulated clock was advanced past its time limit.
+
+    Derived from BaseException, as SystemExit, so that the ``except
+    Exception`` clauses of firmware loops cannot swallow it.
+    """
+
+
+class Clock:
+    """Simulated board clock with microsecond resolution.
+
+    All time related functions (``delay``, ``udelay``, ``millis``, ...)
+    read and advance this clock instead of the host clock.
+
+    In ``INSTANT`` mode (the default) waiting only moves the simulated
+    time forward, so scripts see correct elapsed times while running
+    as fast as the host allows.
+    In ``REALTIME`` mode the clock additionally paces itself against
+    the host clock, such that simulated time never runs ahead of the
+    wall clock.
+
+    Callbacks can be scheduled at simulated times (see ``schedule``);
+    they run while the clock advances past them, in time order. The
+    pending events are kept in a priority queue, so advancing costs
+    only the events which are due.
+    """
+
+    INSTANT = 0
+    REALTIME = 1
+
+    def __init__(self, mode=INSTANT):
+        """
+
+        Parameters
+        ----------
+        mode: int
+            Either Clock.INSTANT or Clock.REALTIME.
+            Defaults to Clock.INSTANT.
+        """
+        self._now_us = 0
+        self._mode = None
+        self._wall_start = 0.0
+        self._sim_start_us = 0
+
+        self._queue = []
+        self._sequence = count()
+
+        # Called after every advance, see Board.service_irqs
+        self.safe_point = None
+
+        # Simulated time (us) the clock may not pass, or None
+        self.limit_us = None
+
+        self.mode(mode)
+
+    def mode(self, value=None):
+        """Get or set the clock mode.
+
+        Parameters
+        ----------
+        value: int, optional
+            Clock.INSTANT or Clock.REALTIME.
+
+        Returns
+        -------
+        out: int
+        """
+        if value is None:
+            return self._mode
+
+        if value not in (self.INSTANT, self.REALTIME):
+            raise ValueError("Clock mode must be INSTANT or REALTIME.")
+
+        self._mode = value
+        self._wall_start = perf_counter()
+        self._sim_start_us = self._now_us
+
+    def micros(self):
+        """Return the simulated time since boot in microseconds."""
+        return self._now_us
+
+    def advance(self, us):
+        """Move the simulated time forward.
+
+        Parameters
+        ----------
+        us: int or float
+            Number of microseconds to wait. Fractions are truncated.
+        """
+        if us < 0:
+            raise ValueError("Cannot advance the clock backwards.")
+
+        target = self._now_us + int(us)
+        limit = self.limit_us
+        if limit is not None and target > limit:
+            if limit > self._now_us:
+                self.advance(limit - self._now_us)
+            raise TimeLimitExceeded(
+                "Simulated time limit of {} us reached.".format(limit))
+
+        queue = self._queue
+        while queue and queue[0][0] <= target:
+            event = heappop(queue)
+            callback = event[2]
+            if callback is None:
+                # Cancelled
+                continue
+            if event[0] > self._now_us:
+                self._now_us = event[0]
+                self._pace()
+            callback()
+
+        if target > self._now_us:
+            self._now_us = target
+            self._pace()
+
+        if self.safe_point is not None:
+            self.safe_point()
+
+    def _pace(self):
+        """In REALTIME mode, wait until the wall clock caught up."""
+        if self._mode == self.REALTIME:
+            target = (self._now_us - self._sim_start_us) / 1000000
+            remaining = target - (perf_counter() - self._wall_start)
+            if remaining > 0:
+                sleep(remaining)
+
+    def schedule(self, at_us, callback):
+        """Call callback() when the clock reaches at_us.
+
+        Parameters
+        ----------
+        at_us: int
+            Simulated time in microseconds. Times in the past run at the
+            next advance.
+        callback: callable
+
+        Returns
+        -------
+        out: list
+            Handle of the event, to be passed to ``cancel``.
+        """
+        event = [at_us, next(self._sequence), callback]
+        heappush(self._queue, event)
+        return event
+
+    def cancel(self, event):
+        """Cancel an event returned by ``schedule``."""
+        event[2] = None
+
+    def next_due(self):
+        """Return the time of the next scheduled event, or None."""
+        queue = self._queue
+        while queue and queue[0][2] is None:
+            heappop(queue)
+        if queue:
+            return queue[0][0]
+        return None
+
+    def reset(self):
+        """Set the simulated time back to zero (boot) and drop all events."""
+        self._now_us = 0
+        self._wall_start = perf_counter()
+        self._sim_start_us = 0
+        self._queue = []
+
+
+
+# ======================================================================
+# ============================= Event log ==============================
+# ======================================================================
+
+def format_event(record):
+    """Format an event record as a human readable line.
+
+    Parameters
+    ----------
+    record: tuple
+        (timestamp_us, peripheral, unit, operation, value)
+
+    Returns
+    -------
+    out: str
+    """
+    timestamp, peripheral, unit, operation, value = record
+    if unit is None:
+        name = peripheral
+    else:
+        name = "{} {}".format(peripheral, unit)
+    if value is None:
+        return "[{:>12} us] {}: {}\n".format(timestamp, name, operation)
+    return "[{:>12} us] {}: {} {}\n".format(timestamp, name, operation, value)
+
+
+class StderrSink:
+    """Event sink writing formatted events to stderr."""
+
+    def emit(self, record):
+        sys.stderr.write(format_event(record))
+
+
+class FileSink:
+    """Event sink appending formatted events to a file."""
+
+    def __init__(self, file):
+        """
+
+        Parameters
+        ----------
+        file: str or file object
+            Path of the log file (opened in append mode) or an already
+            opened text file.
+        """
+        if isinstance(file, str):
+            self._file = open(file, 'a')
+            self._owned = True
+        else:
+            self._file = file
+            self._owned = False
+
+    def emit(self, record):
+        self._file.write(format_event(record))
+
+    def close(self):
+        if self._owned:
+            self._file.close()
+        else:
+            self._file.flush()
+
+
+class EventLog:
+    """Preallocated ring buffer of peripheral events.
+
+    Each record is a tuple (timestamp_us, peripheral, unit, operation,
+    value), e.g. (1000, "LED", 3, "on", None). Records are only formatted
+    when a sink emits them or when ``dump`` is called.
+
+    The verbosity is configured per peripheral (e.g. "LED", "SWITCH",
+    "PYB"):
+        OFF
+            Nothing is done.
+        RECORD
+            The event is stored in the ring buffer.
+        EMIT
+            The event is stored and passed to the sink (if any).
+    """
+
+    OFF = 0
+    RECORD = 1
+    EMIT = 2
+
+    def __init__(self, clock, capacity=4096, level=RECORD, sink=None):
+        """
+
+        Parameters
+        ----------
+        clock: Clock
+            Clock providing the timestamps.
+        capacity: int
+            Number of records kept. Older records are overwritten.
+        level: int
+            Default verbosity for peripherals without an explicit level.
+        sink: object, optional
+            Object with an ``emit(record)`` method, e.g. StderrSink() or
+            FileSink(path). Defaults to None (no output).
+        """
+        self._clock = clock
+        self._capacity = capacity
+        self._records = [None] * capacity
+        self._count = 0
+
+        self._default_level = level
+        self._levels = {}
+        self.sink = sink
+
+    def level(self, peripheral=None, value=None):
+        """Get or set the verbosity of a peripheral.
+
+        Parameters
+        ----------
+        peripheral: str, optional
+            Name of the peripheral. If None, the default level is used.
+        value: int, optional
+            EventLog.OFF, EventLog.RECORD or EventLog.EMIT.
+
+        Returns
+        -------
+        out: int
+        """
+        if value is None:
+            if peripheral is None:
+                return self._default_level
+            return self._levels.get(peripheral, self._default_level)
+
+        if peripheral is None:
+            self._default_level = value
+        else:
+            self._levels[peripheral] = value
+
+    def record(self, peripheral, unit, operation, value=None):
+        """Record an event of a peripheral at the current time."""
+        level = self._levels.get(peripheral, self._default_level)
+        if not level:
+            return
+
+        record = (self._clock.micros(), peripheral, unit, operation, value)
+        self._records[self._count % self._capacity] = record
+        self._count += 1
+
+        if level == self.EMIT and self.sink is not None:
+            self.sink.emit(record)
+
+    def records(self):
+        """Return the stored records, oldest first.
+
+        Returns
+        -------
+        out: list
+        """
+        if self._count <= self._capacity:
+            return self._records[:self._count]
+        start = self._count % self._capacity
+        return self._records[start:] + self._records[:start]
+
+    def dump(self, sink=None):
+        """Emit all stored records to a sink.
+
+        Parameters
+        ----------
+        sink: object, optional
+            Defaults to the configured sink, or stderr if there is none.
+        """
+        if sink is None:
+            sink = self.sink if self.sink is not None else StderrSink()
+        for record in self.records():
+            sink.emit(record)
+
+    def clear(self):
+        """Drop all stored records."""
+        self._records = [None] * self._capacity
+        self._count = 0
+
+    def __len__(self):
+        return min(self._count, self._capacity)
+
+
+# ======================================================================
+# ========================== Signal sources ============================
+# ======================================================================
+
+class SignalSource:
+    """Base class of the sampled signals feeding the analog inputs.
+
+    A source produces one integer sample every ``1 / rate`` seconds of
+    simulated time. Samples are generated in blocks of ``BLOCK_SIZE``
+    values which are cached, such that consecutive reads are an array
+    lookup. Subclasses implement ``_generate``.
+    """
+
+    BLOCK_SIZE = 4096
+
+    def __init__(self, rate=1000):
+        """
+
+        Parameters
+        ----------
+        rate: int or Fraction
+            Sample rate in Hz.
+        """
+        self.rate = rate
+        # No block is cached yet: no sample index falls into this one.
+        self._block_start = -self.BLOCK_SIZE
+        self._block = None
+
+    def _generate(self, start, count):
+        """Return the samples ``start`` to ``start + count`` (exclusive).
+
+        ``start`` is always a multiple of BLOCK_SIZE.
+        """
+        raise NotImplementedError()
+
+    def index(self, t_us):
+        """Return the index of the sample active at time ``t_us``."""
+        return t_us * self.rate // 1000000
+
+    def _block_at(self, start):
+        if start != self._block_start:
+            self._block = array('l', self._generate(start, self.BLOCK_SIZE))
+            self._block_start = start
+        return self._block
+
+    def sample(self, t_us):
+        """Return the sample active at the simulated time ``t_us``."""
+        index = t_us * self.rate // 1000000
+        offset = index - self._block_start
+        if 0 <= offset < self.BLOCK_SIZE:
+            return self._block[offset]
+        return self._block_at(index - index % self.BLOCK_SIZE)[
+            index % self.BLOCK_SIZE]
+
+    def samples(self, index, count):
+        """Return ``count`` consecutive samples starting at ``index``.
+
+        Returns
+        -------
+        out: array
+            Array of signed longs ('l').
+        """
+        out = array('l')
+        size = self.BLOCK_SIZE
+        end = index + count
+        while index < end:
+            offset = index % size
+            block = self._block_at(index - offset)
+            stop = min(size, offset + end - index)
+            out.extend(block[offset:stop])
+            index += stop - offset
+        return out
+
+    def samples_at(self, t_us, count, freq):
+        """Return ``count`` samples taken at ``freq`` Hz from ``t_us`` on.
+
+        Returns
+        -------
+        out: array
+            Array of signed longs ('l').
+        """
+        if freq == self.rate:
+            return self.samples(self.index(t_us), count)
+
+        first = self.index(t_us)
+        rate = self.rate
+        indices = [
+            t_us * rate // 1000000 + k * rate // freq for k in range(count)]
+        block = self.samples(first, indices[-1] - first + 1 if count else 0)
+        return array('l', [block[i - first] for i in indices])
+
+
+class Constant(SignalSource):
+    """Signal holding a fixed value.
+
+    The value may be changed at any time (e.g. by a stimulus file), so
+    no block of samples is cached.
+    """
+
+    def __init__(self, value, rate=1000):
+        super().__init__(rate)
+        self.value = value
+
+    def _generate(self, start, count):
+        return [self.value] * count
+
+    def sample(self, t_us):
+        return self.value
+
+    def samples(self, index, count):
+        return array('l', [self.value]) * count
+
+    def samples_at(self, t_us, count, freq):
+        return array('l', [self.value]) * count
+
+
+class Sine(SignalSource):
+    """Sine wave: offset + amplitude * sin(2 pi freq t + phase)."""
+
+    def __init__(self, amplitude, freq, offset=0, phase=0.0, rate=1000):
+        """
+
+        Parameters
+        ----------
+        amplitude: float
+        freq: float
+            Frequency of the wave in Hz.
+        offset: float
+        phase: float
+            Phase in radians.
+        rate: int
+            Sample rate in Hz.
+        """
+        super().__init__(rate)
+        self.amplitude = amplitude
+        self.freq = freq
+        self.offset = offset
+        self.phase = phase
+
+    def _generate(self, start, count):
+        step = 2 * math.pi * self.freq / self.rate
+        amplitude, offset, phase, sin = (
+            self.amplitude, self.offset, self.phase, math.sin)
+        return [
+            round(offset + amplitude * sin(step * i + phase))
+            for i in range(start, start + count)]
+
+
+class Noise(SignalSource):
+    """Uniform pseudo-random noise between low and high (inclusive).
+
+    The samples only depend on the seed and their index, so every run
+    with the same seed reads the same values.
+    """
+
+    def __init__(self, low, high, seed=0, rate=1000):
+        super().__init__(rate)
+        self.low = low
+        self.high = high
+        self.seed = seed
+
+    def _generate(self, start, count):
+        generator = Random(self.seed * 1000003 + start // self.BLOCK_SIZE)
+        return generator.choices(range(self.low, self.high + 1), k=count)
+
+
+class Ramp(SignalSource):
+    """Sawtooth rising from low to high once every ``period`` seconds."""
+
+    def __init__(self, low, high, period, rate=1000):
+        super().__init__(rate)
+        self.low = low
+        self.high = high
+        self.period = period
+
+    def _generate(self, start, count):
+        steps = max(int(self.period * self.rate), 1)
+        low, span = self.low, self.high - self.low
+        if steps == 1:
+            return [low] * count
+        return [
+            low + span * (i % steps) // (steps - 1)
+            for i in range(start, start + count)]
+
+
+class Recorded(SignalSource):
+    """Signal replaying recorded samples.
+
+    After the last sample the recording starts over if ``loop`` is True,
+    otherwise the last sample is held.
+    """
+
+    def __init__(self, samples, rate=1000, loop=True):
+        super().__init__(rate)
+        self.recording = array('l', samples)
+        self.loop = loop
+
+    def _generate(self, start, count):
+        recording = self.recording
+        length = len(recording)
+        if not length:
+            return [0] * count
+        if self.loop:
+            offset = start % length
+            repeats = (offset + count) // length + 1
+            return (recording * repeats)[offset:offset + count]
+        out = recording[start:start + count]
+        out.extend([recording[-1]] * (count - len(out)))
+        return out
+
+
+def _default_signal(channel, seed):
+    """Create the source used by a channel nobody attached a source to."""
+    if channel.startswith('accel'):
+        return Noise(0, 10, seed=seed, rate=100)
+    if channel.startswith('adc'):
+        return Noise(0, 4095, seed=seed, rate=10000)
+    return Noise(0, 255, seed=seed, rate=1000000)
+
+
+
 # ======================================================================
 # ======================== Pyboard connections ===========================
 # ======================================================================
 
 PYBOARD_PINS = {
     "X1": {
+        "cpu": "A0",
         "status": "available",
         "role": "PWM",
         "usage": None,
     },
 
     "X2": {
+        "cpu": "A1",
         "status": "available",
         "role": "PWM",
         "usage": None,
     },
 
     "X3": {
+        "cpu": "A2",
         "status": "available",
         "role": "PWM",
         "usage": None,
     },
 
     "X4": {
+        "cpu": "A3",
         "status": "available",
         "role": "PWM",
         "usage": None,
     },
 
     "X5": {
+        "cpu": "A4",
         "status": "available",
         "role": "PWM",
         "usage": None,
     },
 
     "X6": {
+        "cpu": "A5",
         "status": "available",
         "role": "PWM",
         "usage": None,
     },
+
+    "X9": {
+        "cpu": "B6",
+        "status": "available",
+        "role": "I2C",
+        "usage": None,
+    },
+
+    "X10": {
+        "cpu": "B7",
+        "status": "available",
+        "role": "I2C",
+        "usage": None,
+    },
+
+    "Y9": {
+        "cpu": "B10",
+        "status": "available",
+        "role": "I2C",
+        "usage": None,
+    },
+
+    "Y10": {
+        "cpu": "B11",
+        "status": "available",
+        "role": "I2C",
+        "usage": None,
+    },
 }
 
 
-def _check_pin_availability(pin_name):
-    """
+def _check_pin_availability(pin_name, usage=None):
+    """Claim a pin of the current board.
 
     Parameters
     ----------
     pin_name: str
+    usage: object, optional
+        Description of the user of the pin, reported when the pin is
+        claimed again.
 
     Returns
     -------
+    out: bool
+        True, if the pin was available.
+    """
+    return current_board().claim_pin(pin_name, usage)
+
+
+# ======================================================================
+# =============================== Board ================================
+# ======================================================================
+
+class Board:
+    """State of one emulated pyboard.
+
+    A board owns its pin table, clock, event log and the peripherals
+    created while it is the current board, such that several isolated
+    boards can live in one process.
+
+    The module level ``pyb`` API always acts on the current board of the
+    calling thread (see ``current_board``). Use a board as a context
+    manager to make it current:
 
+        with Board() as board:
+            pyb.LED(1).on()
     """
-    if pin_name not in PYBOARD_PINS:
-        raise Exception("Allocated Pin is not available on a pyboard.")
 
-    if PYBOARD_PINS[pin_name]["status"] is not "available":
-        usage = PYBOARD_PINS[pin_name]["usage"]
-        error_message = "Allocated Pin is already used by {}.".format(usage)
-        raise Exception(error_message)
+    def __init__(self, clock_mode=Clock.INSTANT, event_capacity=4096,
+                 seed=0):
+        """
+
+        Parameters
+        ----------
+        clock_mode: int
+            Clock.INSTANT or Clock.REALTIME.
+        event_capacity: int
+            Number of events kept by the event log.
+        seed: int
+            Seed of the default signal sources. Runs with the same seed
+            read the same values.
+        """
+        self.clock = Clock(clock_mode)
+        self.events = EventLog(self.clock, capacity=event_capacity)
+        self.seed = seed
+
+        self.pins = None
+        self.peripherals = []
+        self.fixed = {}
+        self.signals = {}
+        self.pin_watchers = {}
+        self.pin_objects = {}
+        self.pin_levels = {}
+        self.irq_enabled = True
+        self.pending_irqs = deque()
+        self._previous = []
+
+        # Records output changes if set, see trace.Tracer
+        self.tracer = None
+
+        self._owner = threading.get_ident()
+        self._in_irq = False
+        self._wakeup_signal = None
+        self.clock.safe_point = self.service_irqs
+
+        self.reset()
+
+    def reset(self):
+        """Bring the board back to its boot state.
+
+        The pin table is restored, the clock is set back to zero, the
+        event log is cleared and all peripherals are released.
+        """
+        self.pins = {
+            name: entry.copy() for name, entry in PYBOARD_PINS.items()
+        }
+        self.peripherals = []
+        self.fixed = {}
+        self.signals = {}
+        self.pin_watchers = {}
+        self.pin_objects = {}
+        self.pin_levels = {}
+        self.irq_enabled = True
+        self.pending_irqs = deque()
+        self._in_irq = False
+        self.clock.reset()
+        self.events.clear()
+
+    def claim_pin(self, pin_name, usage=None):
+        """Mark a pin as used.
+
+        Parameters
+        ----------
+        pin_name: str
+        usage: object, optional
+
+        Returns
+        -------
+        out: bool
+            True, if the pin was available.
+        """
+        if pin_name not in self.pins:
+            raise Exception("Allocated Pin is not available on a pyboard.")
+
+        entry = self.pins[pin_name]
+        if entry["status"] != "available":
+            error_message = "Allocated Pin is already used by {}.".format(
+                entry["usage"])
+            raise Exception(error_message)
+
+        entry["status"] = "not available"
+        entry["usage"] = usage
+        return True
+
+    def signal(self, channel, source=None):
+        """Get or attach the signal source of an input channel.
+
+        Channels are named after the input they feed, e.g. 'accel.x',
+        'adc.X2' or 'spi1'. Channels without an attached source
+        read seeded noise.
+
+        Parameters
+        ----------
+        channel: str
+        source: SignalSource, optional
+
+        Returns
+        -------
+        out: SignalSource
+        """
+        if source is not None:
+            self.signals[channel] = source
+            return source
+
+        source = self.signals.get(channel)
+        if source is None:
+            seed = self.seed ^ zlib.crc32(channel.encode())
+            source = self.signals[channel] = _default_signal(channel, seed)
+        return source
+
+    def watch_pin(self, pin_name, watcher):
+        """Call watcher(pin_name, value) whenever the level of a pin changes.
+
+        Parameters
+        ----------
+        pin_name: str
+        watcher: callable
+        """
+        self.pin_watchers.setdefault(pin_name, []).append(watcher)
+
+    def unwatch_pin(self, pin_name, watcher):
+        """Remove a watcher added with ``watch_pin``."""
+        watchers = self.pin_watchers.get(pin_name, [])
+        if watcher in watchers:
+            watchers.remove(watcher)
+        if not watchers:
+            self.pin_watchers.pop(pin_name, None)
+
+    def pin_value(self, pin_name):
+        """Return the logic level of a pin."""
+        pin = self.pin_objects.get(pin_name)
+        if pin is not None:
+            return pin.value()
+        return self.pin_levels.get(pin_name, False)
+
+    def set_pin(self, pin_name, value):
+        """Drive a pin from outside the board (stimulus).
+
+        Level changes are reported to the pin watchers, e.g. the ExtInt
+        of the pin.
+        """
+        pin = self.pin_objects.get(pin_name)
+        if pin is not None:
+            pin.value(value)
+            return
+
+        value = bool(value)
+        if value != self.pin_levels.get(pin_name, False):
+            self.pin_levels[pin_name] = value
+            for watcher in self.pin_watchers.get(pin_name, ()):
+                watcher(pin_name, value)
+
+    def raise_irq(self, handler, argument):
+        """Request an interrupt: handler(argument).
+
+        The handler runs right away when raised from the script thread
+        with IRQs enabled. Otherwise (IRQs disabled, another handler
+        running, or raised from another thread) it is queued and run at
+        the next safe point, see ``service_irqs``.
+        """
+        if (self.irq_enabled and not self._in_irq
+                and threading.get_ident() == self._owner):
+            self._in_irq = True
+            try:
+                handler(argument)
+            finally:
+                self._in_irq = False
+            if self.pending_irqs:
+                self.service_irqs()
+        else:
+            self.pending_irqs.append((handler, argument))
+            if (self._wakeup_signal is not None
+                    and threading.get_ident() != self._owner):
+                import signal
+                signal.pthread_kill(self._owner, self._wakeup_signal)
+
+    def service_irqs(self):
+        """Run the queued interrupt handlers, in order.
+
+        This is the safe point of the script: it is called whenever the
+        clock advances (delay, udelay, wfi, blocking reads, ...), when
+        IRQs are enabled again and when a switch is polled.
+        """
+        pending = self.pending_irqs
+        if (not pending or not self.irq_enabled or self._in_irq
+                or threading.get_ident() != self._owner):
+            return
+
+        self._in_irq = True
+        try:
+            while pending and self.irq_enabled:
+                handler, argument = pending.popleft()
+                handler(argument)
+        finally:
+            self._in_irq = False
+
+    def enable_wakeup(self, signum=None):
+        """Deliver interrupts raised by other threads without waiting
+        for a safe point.
+
+        Such interrupts then signal the script thread, which runs the
+        queued handlers between two of its Python instructions, e.g.
+        inside a ``while True: pass`` loop. Must be called from the main
+        thread, which has to be the thread running the script.
+
+        Parameters
+        ----------
+        signum: int, optional
+            Signal used for the wakeup. Defaults to SIGUSR1.
+        """
+        # Imported here, it is slow to import and rarely needed
+        import signal
+
+        if signum is None:
+            signum = signal.SIGUSR1
+        signal.signal(signum, lambda number, frame: self.service_irqs())
+        self._owner = threading.get_ident()
+        self._wakeup_signal = signum
+
+    def disable_wakeup(self):
+        """Undo ``enable_wakeup``."""
+        if self._wakeup_signal is not None:
+            import signal
+            signal.signal(self._wakeup_signal, signal.SIG_DFL)
+            self._wakeup_signal = None
+
+    def enable_irq(self, state=True):
+        """Enable (or disable) IRQs; run the handlers queued meanwhile."""
+        self.irq_enabled = bool(state)
+        self.service_irqs()
+
+    def disable_irq(self):
+        """Disable IRQs and return the previous state."""
+        state = self.irq_enabled
+        self.irq_enabled = False
+        return state
+
+    def register(self, peripheral):
+        """Add a peripheral to the board."""
+        self.peripherals.append(peripheral)
+
+    def fixed_peripheral(self, cls, key=None):
+        """Return the object of a peripheral soldered on the board.
+
+        The board has one of each (LED n, the switch, the
+        accelerometer, timer n, I2C bus n): constructing it again returns
+        the same object, as on the pyboard. A new object is created (not initialised yet)
+        on the first call.
+
+        Parameters
+        ----------
+        cls: type
+        key: object, optional
+            Identifies the peripheral among those of its class, e.g. the
+            LED or timer number.
+        """
+        peripheral = self.fixed.get((cls, key))
+        if peripheral is None:
+            peripheral = object.__new__(cls)
+            self.fixed[(cls, key)] = peripheral
+        return peripheral
+
+    def activate(self):
+        """Make this board the current board of the calling thread."""
+        self._previous.append(getattr(_state, 'board', None))
+        _state.board = self
+        self._owner = threading.get_ident()
+        return self
+
+    def deactivate(self):
+        """Restore the board which was current before ``activate``."""
+        _state.board = self._previous.pop()
+
+    def __enter__(self):
+        return self.activate()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.deactivate()
+
+
+_state = threading.local()
+_default_board = Board()
+
+
+def current_board():
+    """Return the board the ``pyb`` API of the calling thread acts on.
+
+    Threads which did not activate a board share the default board.
+    """
+    board = getattr(_state, 'board', None)
+    if board is None:
+        return _default_board
+    return board
+
+
+# ======================================================================
+# ============================== LCD font ==============================
+# ======================================================================
+
+# font8x8_basic (public domain), characters 32 to 127. Each character is
+# 8 rows of 8 pixels, top row first, the lowest bit is the left pixel.
+FONT_8X8 = bytes.fromhex(
+    '0000000000000000 183C3C1818001800 3636000000000000 36367F367F363600'
+    '0C3E031E301F0C00 006333180C666300 1C361C6E3B336E00 0606030000000000'
+    '180C0606060C1800 060C1818180C0600 00663CFF3C660000 000C0C3F0C0C0000'
+    '00000000000C0C06 0000003F00000000 00000000000C0C00 6030180C06030100'
+    '3E63737B6F673E00 0C0E0C0C0C0C3F00 1E33301C06333F00 1E33301C30331E00'
+    '383C36337F307800 3F031F3030331E00 1C06031F33331E00 3F3330180C0C0C00'
+    '1E33331E33331E00 1E33333E30180E00 000C0C00000C0C00 000C0C00000C0C06'
+    '180C0603060C1800 00003F00003F0000 060C1830180C0600 1E3330180C000C00'
+    '3E637B7B7B031E00 0C1E33333F333300 3F66663E66663F00 3C66030303663C00'
+    '1F36666666361F00 7F46161E16467F00 7F46161E16060F00 3C66030373667C00'
+    '3333333F33333300 1E0C0C0C0C0C1E00 7830303033331E00 6766361E36666700'
+    '0F06060646667F00 63777F7F6B636300 63676F7B73636300 1C36636363361C00'
+    '3F66663E06060F00 1E3333333B1E3800 3F66663E36666700 1E33070E38331E00'
+    '3F2D0C0C0C0C1E00 3333333333333F00 33333333331E0C00 6363636B7F776300'
+    '6363361C1C366300 3333331E0C0C1E00 7F6331184C667F00 1E06060606061E00'
+    '03060C1830604000 1E18181818181E00 081C366300000000 00000000000000FF'
+    '0C0C180000000000 00001E303E336E00 0706063E66663B00 00001E3303331E00'
+    '3830303E33336E00 00001E333F031E00 1C36060F06060F00 00006E33333E301F'
+    '0706366E66666700 0C000E0C0C0C1E00 300030303033331E 070666361E366700'
+    '0E0C0C0C0C0C1E00 0000337F7F6B6300 00001F3333333300 00001E3333331E00'
+    '00003B66663E060F 00006E33333E3078 00003B6E66060F00 00003E031E301F00'
+    '080C3E0C0C2C1800 0000333333336E00 00003333331E0C00 0000636B7F7F3600'
+    '000063361C366300 00003333333E301F 00003F190C263F00 380C0C070C0C3800'
+    '1818180018181800 070C0C380C0C0700 6E3B000000000000 0000000000000000'
+)
 
-    PYBOARD_PINS[pin_name]["status"] = "not available"
-    return True
 
 # ======================================================================
 # ============================== Classes ================================
 # ======================================================================
 
 
+class _PinNames:
+    """Namespace of the named pins, i.e. ``Pin.board`` and ``Pin.cpu``.
+
+    Attributes are looked up in the pin table on first access, e.g.
+    ``Pin.board.X1`` and ``Pin.cpu.A0`` are both 'X1'.
+    """
+
+    def __init__(self, cpu=False):
+        self._cpu = cpu
+
+    def _names(self):
+        if self._cpu:
+            return {entry["cpu"]: name for name, entry in PYBOARD_PINS.items()}
+        return {name: name for name in PYBOARD_PINS}
+
+    def __getattr__(self, name):
+        pin_name = self._names().get(name)
+        if pin_name is None:
+            raise AttributeError("No pin named {}.".format(name))
+        setattr(self, name, pin_name)
+        return pin_name
+
+    def __dir__(self):
+        return list(self._names())
+
+
 class Pin:
     """http://docs.micropython.org/en/latest/library/pyb.Pin.html"""
 
@@ -128,11 +1113,12 @@ class Pin:
     # Pull constants
     PULL_DOWN = 7
     PULL_NONE = 8
-    PULL_UP = 8
+    PULL_UP = 9
 
-    board = Mock()
+    board = _PinNames()
+    cpu = _PinNames(cpu=True)
 
-    def __init__(self, pin_id, **kwargs):
+    def __init__(self, pin_id, *args, **kwargs):
         """Create a new Pin object associated with the id.
 
         If additional arguments are given, they are used to initialise
@@ -144,12 +1130,16 @@ class Pin:
 
         """
 
-        _check_pin_availability(pin_id)
+        self._board = current_board()
+        self._board.claim_pin(pin_id, self)
+        self._board.register(self)
+        self._board.pin_objects[pin_id] = self
         self._id = pin_id
+        self._trace_name = 'pin.{}'.format(pin_id)
 
         # Init attributes
-        if kwargs:
-            self.init(kwargs)
+        if args or kwargs:
+            self.init(*args, **kwargs)
         else:
             self._mode = None
             self._pull = None
@@ -241,11 +1231,20 @@ class Pin:
             With no argument, depending on the logic level of the pin.
         """
         # sys.stderr.write("Pin value: {}\n".format(value))
-        if value is not None:
-            self._pin_value = bool(value)
-        else:
+        if value is None:
             return self._pin_value
 
+        value = bool(value)
+        if value != self._pin_value:
+            self._pin_value = value
+            tracer = self._board.tracer
+            if tracer is not None:
+                tracer.change(self._trace_name, value)
+            watchers = self._board.pin_watchers.get(self._id)
+            if watchers:
+                for watcher in watchers:
+                    watcher(self._id, value)
+
     def af(self):
         # Todo
         raise NotImplementedError()
@@ -306,20 +1305,45 @@ class ExtInt:
 
         Parameters
         ----------
-        pin
-        mode
-        pull
-        callback
+        pin: Pin or str
+            The pin (or pin name) to watch.
+        mode: int
+            ExtInt.IRQ_RISING, ExtInt.IRQ_FALLING or
+            ExtInt.IRQ_RISING_FALLING.
+        pull: int
+            Pin.PULL_NONE, Pin.PULL_UP or Pin.PULL_DOWN.
+        callback: callable
+            Called with the line number when the edge occurs.
         """
 
-        _check_pin_availability(pin)
+        self._board = current_board()
+        if isinstance(pin, Pin):
+            pin_name = pin.name()
+        else:
+            pin_name = pin
+            self._board.claim_pin(pin_name, self)
+            if pull == Pin.PULL_UP:
+                self._board.pin_levels[pin_name] = True
+        self._board.register(self)
         self.pin = pin
+        self._pin_name = pin_name
+        self._line = int(self._board.pins[pin_name]["cpu"][1:])
 
         self.mode = mode
         self.pull = pull
         self.callback = callback
 
+        self._rising = mode in (self.IRQ_RISING, self.IRQ_RISING_FALLING)
+        self._falling = mode in (self.IRQ_FALLING, self.IRQ_RISING_FALLING)
+
         self.intrerupt = True
+        self._board.watch_pin(pin_name, self._edge)
+
+    def _edge(self, pin_name, value):
+        """Called on every level change of the pin."""
+        if self.intrerupt and (self._rising if value else self._falling):
+            if self.callback is not None:
+                self._board.raise_irq(self.callback, self._line)
 
     def disable(self):
         """Disable the interrupt associated with the ExtInt object.
@@ -332,50 +1356,117 @@ class ExtInt:
         self.intrerupt = True
 
     def line(self):
-        raise NotImplementedError()
+        """Return the line number that the pin is mapped to."""
+        return self._line
 
     def swint(self):
-        raise NotImplementedError()
+        """Trigger the callback from software."""
+        if self.callback is not None:
+            self._board.raise_irq(self.callback, self._line)
 
 
 class Accel:
 
+    def __new__(cls):
+        return current_board().fixed_peripheral(cls)
+
+    def __init__(self):
+        if '_board' in vars(self):
+            return
+        self._board = current_board()
+        self._board.register(self)
+
     @property
     def x(self):
-        return randint(0, 10)
+        board = self._board
+        return board.signal('accel.x').sample(board.clock.micros())
 
     @property
     def y(self):
         # sys.stderr.write("ACCEL: y\n")
-        return randint(0, 10)
+        board = self._board
+        return board.signal('accel.y').sample(board.clock.micros())
 
 
 class LCD:
+    """http://docs.micropython.org/en/latest/library/pyb.LCD.html
 
-    def __init__(self, lcd):
+    The pixels are kept in byte-per-pixel framebuffers (row major).
+    Drawing happens in the hidden (back) buffer and ``show`` copies it to
+    the visible (front) buffer.
+
+    The rows drawn to since the last ``show`` are tracked, so ``show``
+    only copies those. Consumers of the screen (viewers, exporters, frame
+    differs) can process only the rows which changed, either by watching
+    the LCD or by polling ``changed_rows``.
+    """
+
+    WIDTH = 128
+    HEIGHT = 32
+
+    # Character -> pixel rows, see _glyph
+    _glyphs = {}
+
+    def __init__(self, lcd='X'):
         """
 
         Parameters
         ----------
-        lcd
+        lcd: str or dict
+            The skin position ('X' or 'Y'), or a dict with the keys 'x'
+            and 'y' giving the display size in pixels.
         """
-        self._y = lcd['y']
-        self._x = lcd['x']
-        self.skin_position = None
-        self._buffer = None
-        self._hidden_buffer = {}
+        if isinstance(lcd, dict):
+            self._x = lcd['x']
+            self._y = lcd['y']
+            self.skin_position = None
+        else:
+            self._x = self.WIDTH
+            self._y = self.HEIGHT
+            self.skin_position = lcd
+
+        self._size = self._x * self._y
+        self._buffer = bytearray(self._size)
+        self._hidden_buffer = bytearray(self._size)
+        self._fill_patterns = {}
+
+        # Number of the last shown frame, and the listeners of show
+        self.frame = 0
+        self._watchers = []
+        self._reset_rows()
+        self._visible_fill = 0
 
         self.backlight = None
         self.contrast_value = None
 
+        self._board = current_board()
+        self._board.register(self)
+
     def __call__(self, skin_position):
         self.skin_position = skin_position
         if skin_position == 'Y':
             self._x, self._y = self._y, self._x
+            self._reset_rows()
         self.fill(0)
 
         return self
 
+    def _reset_rows(self):
+        # Rows of the hidden buffer drawn to since the last show, and the
+        # colour of the last fill since then (None: no fill).
+        self._dirty = set()
+        self._fill = None
+        # Rows of the visible buffer which are not uniformly of the
+        # colour of the last shown fill (None: unknown, any row may be).
+        self._visible_fill = None
+        self._visible_drawn = set()
+        # Frame in which each row of the visible buffer last changed
+        self._row_frames = [self.frame] * self._y
+
+        # Character lines and [column, row] cursor of ``write``
+        self._lines = None
+        self._cursor = [0, 0]
+
     def command(self, instr_data, buf):
         """Send an arbitrary command to the LCD. Pass 0 for instr_data to send
         an instruction, otherwise pass 1 to send data. buf is a buffer
@@ -390,59 +1481,233 @@ class LCD:
         self.contrast_value = value
 
     def get(self, x, y):
+        """Get the pixel at position (x, y) of the visible buffer.
+
+        Returns
+        -------
+        out: int
+            0 or 1. Pixels outside the screen are reported as 0.
+        """
         # sys.stderr.write("LCD:get: %sx%s\n" % (x, y))
-        if self._buffer is None:
-            return False
-        return self._buffer[(x, y)]
+        if 0 <= x < self._x and 0 <= y < self._y:
+            return self._buffer[y * self._x + x]
+        return 0
 
     def light(self, value):
         # sys.stderr.write("LCD:light: %s\n" % value)
         self.backlight = bool(value)
 
     def fill(self, colour):
+        """Fill the hidden buffer with the given colour (0 or 1)."""
         # sys.stderr.write("LCD:fill: %s\n" % colour)
-        for y in range(self._y):
-            for x in range(self._x):
-                self.pixel(x, y, colour)
+        colour = 1 if colour else 0
+        pattern = self._fill_patterns.get(colour)
+        if pattern is None:
+            pattern = bytes([colour]) * self._size
+            self._fill_patterns[colour] = pattern
+        self._hidden_buffer[:] = pattern
+        self._dirty.clear()
+        self._fill = colour
 
     def pixel(self, x, y, colour):
+        """Set the pixel at (x, y) in the hidden buffer.
+
+        Pixels outside the screen are ignored, as on the pyboard.
+        """
         # sys.stderr.write("LCD:fill: %sx%s %s\n" % (x, y, colour))
-        self._hidden_buffer[(x, y)] = colour
+        if 0 <= x < self._x and 0 <= y < self._y:
+            self._hidden_buffer[y * self._x + x] = 1 if colour else 0
+            self._dirty.add(y)
 
     def show(self):
+        """Copy the hidden buffer to the screen.
+
+        Only the rows which may differ are compared and copied: the rows
+        drawn to since the last show and, after a fill, the rows drawn
+        to before it. The frame number is incremented and the watchers
+        are called with the rows which changed on the screen.
+        """
         # sys.stderr.write("LCD:show\n")
-        self._buffer = self._hidden_buffer.copy()
+        width = self._x
+        hidden = self._hidden_buffer
+        visible = self._buffer
+        fill = self._fill
+        dirty = self._dirty
+
+        if fill is None:
+            candidates = dirty
+        elif self._visible_fill is None:
+            candidates = range(self._y)
+        else:
+            candidates = dirty | self._visible_drawn
+
+        changed = []
+        for y in candidates:
+            start = y * width
+            stop = start + width
+            row = hidden[start:stop]
+            if row != visible[start:stop]:
+                visible[start:stop] = row
+                changed.append(y)
+
+        if fill is not None:
+            if self._visible_fill is not None and fill != self._visible_fill:
+                # The rows which were uniform on both sides changed colour
+                visible[:] = hidden
+                changed = sorted(set(range(self._y)).difference(
+                    candidates).union(changed))
+            self._visible_fill = fill
+            self._visible_drawn = set(dirty)
+        else:
+            self._visible_drawn |= dirty
+        changed.sort()
+        self._dirty = set()
+        self._fill = None
+
+        self.frame += 1
+        frame = self.frame
+        row_frames = self._row_frames
+        for y in changed:
+            row_frames[y] = frame
+        for watcher in self._watchers:
+            watcher(self, changed)
+
+    def changed_rows(self, since=0):
+        """Return the rows of the screen which changed after a frame.
+
+        Parameters
+        ----------
+        since: int
+            Frame number, e.g. the value of ``frame`` when the consumer
+            last processed the screen.
+
+        Returns
+        -------
+        out: list
+            The row indexes, in ascending order.
+        """
+        return [y for y, frame in enumerate(self._row_frames)
+                if frame > since]
+
+    def row(self, y):
+        """Return a copy of row y of the screen (one byte per pixel)."""
+        start = y * self._x
+        return bytes(self._buffer[start:start + self._x])
+
+    def watch(self, watcher):
+        """Call watcher(lcd, rows) after every ``show``.
+
+        rows are the indexes of the rows of the screen which changed,
+        empty if the frame is identical to the previous one.
+        """
+        self._watchers.append(watcher)
+
+    def unwatch(self, watcher):
+        """Remove a watcher added with ``watch``."""
+        if watcher in self._watchers:
+            self._watchers.remove(watcher)
+
+    @classmethod
+    def _glyph(cls, char):
+        """Return the 8 pixel rows of a character (one byte per pixel).
+
+        Characters outside the font are drawn as character 127.
+        """
+        glyph = cls._glyphs.get(char)
+        if glyph is None:
+            code = ord(char)
+            if not 32 <= code <= 127:
+                code = 127
+            offset = (code - 32) * 8
+            glyph = tuple(
+                bytes((bits >> i) & 1 for i in range(8))
+                for bits in FONT_8X8[offset:offset + 8]
+            )
+            cls._glyphs[char] = glyph
+        return glyph
 
     def text(self, text, x, y, colour):
+        """Draw text at (x, y) into the hidden buffer, in 8x8 characters.
+
+        Only the pixels of the characters are set to colour, the
+        background is left as it is. Text outside the screen is clipped.
+        """
         # sys.stderr.write("LCD:text %s %sx%s %s\n" % (text, x, y, colour))
-        # font = 'clr8x8'
-        # figlet = Figlet(font=font, width=self._x)
-        # txt = figlet.renderText(text)
-        txt = text
-        dx = 0
-        dy = 0
-        color = 0
-        for item in txt:
-            if item == ' ':
-                color = int(not bool(colour))
-            elif item == '#':
-                color = colour
-            elif item == '\n':
-                dy += 1
-                dx = 0
+        x0 = max(x, 0)
+        x1 = min(x + 8 * len(text), self._x)
+        if x0 >= x1:
+            return
+
+        glyphs = [self._glyph(char) for char in text]
+        buffer = self._hidden_buffer
+        for row in range(8):
+            line = y + row
+            if not 0 <= line < self._y:
                 continue
-            self.pixel(dx + x, dy + y, color)
-            dx += 1
+
+            # One row of the whole text is blitted at once: the pixel
+            # bytes (0 or 1) are combined as one big integer.
+            pixels = b''.join([glyph[row] for glyph in glyphs])
+            mask = int.from_bytes(pixels[x0 - x:x1 - x], 'big')
+            if not mask:
+                continue
+            start = line * self._x + x0
+            stop = line * self._x + x1
+            current = int.from_bytes(buffer[start:stop], 'big')
+            if colour:
+                current |= mask
+            else:
+                current &= ~mask
+            buffer[start:stop] = current.to_bytes(stop - start, 'big')
+            self._dirty.add(line)
 
     def write(self, text):
+        """Write text to the screen at the cursor, as a terminal would.
+
+        The screen holds lines of 8x8 characters. Newlines and text
+        reaching the right edge continue on the next line and the lines
+        scroll up at the bottom; ``\\r`` returns to the start of the
+        line. The text lines are drawn on a clear background and shown
+        right away.
+        """
         # sys.stderr.write("LCD:write: %s\n" % text)
-        self.text(text, 0, 0, 0)
+        columns = self._x // 8
+        rows = self._y // 8
+        if self._lines is None:
+            self._lines = [[' '] * columns for _ in range(rows)]
+            self._cursor = [0, 0]
+        lines = self._lines
+        column, row = self._cursor
+
+        for char in text:
+            if char == '\r':
+                column = 0
+                continue
+            if char == '\n' or column >= columns:
+                column = 0
+                row += 1
+                if row >= rows:
+                    lines.append(lines.pop(0))
+                    lines[-1][:] = ' ' * columns
+                    row = rows - 1
+                if char == '\n':
+                    continue
+            lines[row][column] = char
+            column += 1
+        self._cursor = [column, row]
+
+        buffer = self._hidden_buffer
+        for index, line in enumerate(lines):
+            start = index * 8 * self._x
+            buffer[start:start + 8 * self._x] = bytes(8 * self._x)
+            self.text(''.join(line), 0, index * 8, 1)
+        self._dirty.update(range(rows * 8))
         self.show()
 
-    def _print_hidden_buffer(self):
-        for y in range(self._y):
-            for x in range(self._x):
-                sys.stdout.write(str(self._hidden_buffer[(x, y)]))
+    def _print_hidden_buffer(self, rows=None):
+        for y in range(self._y) if rows is None else rows:
+            row = self._hidden_buffer[y * self._x:(y + 1) * self._x]
+            sys.stdout.write(''.join(map(str, row)))
             sys.stdout.write('\n')
 
 
@@ -452,30 +1717,45 @@ class LED:
     _intensity_min = 0
     _intensity_max = 100
 
+    def __new__(cls, color):
+        return current_board().fixed_peripheral(cls, color)
+
     def __init__(self, color):
+        if '_board' in vars(self):
+            return
         self._intensity = 0
         self._color = color
 
+        self._board = current_board()
+        self._board.register(self)
+
+    def _set_intensity(self, value):
+        if value != self._intensity:
+            self._intensity = value
+            tracer = self._board.tracer
+            if tracer is not None:
+                tracer.change('led.{}'.format(self._color), value)
+
     def on(self):
-        sys.stderr.write("LED %s: on\n" % self._color)
-        self._intensity = self._intensity_max
+        self._board.events.record("LED", self._color, "on")
+        self._set_intensity(self._intensity_max)
 
     def off(self):
-        sys.stderr.write("LED %s: off\n" % self._color)
-        self._intensity = self._intensity_min
+        self._board.events.record("LED", self._color, "off")
+        self._set_intensity(self._intensity_min)
 
     def toggle(self):
-        sys.stderr.write("LED %s: toggle\n" % self._color)
+        self._board.events.record("LED", self._color, "toggle")
         if self._intensity == self._intensity_min:
             return self.on()
         return self.off()
 
     def intensity(self, value=None):
-        sys.stderr.write("LED %s: intensity %d\n" % (self._color, value))
         if value is None:
             return self._intensity
 
-        self._intensity = value
+        self._board.events.record("LED", self._color, "intensity", value)
+        self._set_intensity(value)
 
 
 class Switch:
@@ -484,35 +1764,142 @@ class Switch:
     http://docs.micropython.org/en/latest/library/pyb.Switch.html
     """
 
-    _pressed = False
+    def __new__(cls, name=None, callable_func=None, debounce_us=0):
+        return current_board().fixed_peripheral(cls)
+
+    def __init__(self, name=None, callable_func=None, debounce_us=0):
+        """
+
+        The board has one switch: ``Switch()`` always returns the same
+        object and only the arguments given again change it.
+
+        Parameters
+        ----------
+        name: str, optional
+            Name used in the event log.
+        callable_func: callable, optional
+            Called (without arguments) when the switch is pressed.
+        debounce_us: int
+            Edges closer than this to the previous accepted edge are
+            treated as contact bounce: the level is only looked at again
+            once the switch settled, debounce_us after that edge.
+        """
+        if '_board' in vars(self):
+            if name is not None:
+                self._name = name
+            if callable_func is not None:
+                self._callable = callable_func
+            if debounce_us:
+                self._debounce_us = debounce_us
+            return
 
-    def __init__(self, name=None, callable_func=None):
         self._name = name
         self._callable = callable_func
+        self._pressed = False
+        # Level of the contact, _pressed follows it once debounced
+        self._level = False
+        self._debounce_us = debounce_us
+        self._last_edge_us = None
+        self._settle_event = None
+
+        self._board = current_board()
+        self._board.register(self)
 
     def __call__(self):
-        sys.stderr.write(
-            "SWITCH {} call > {}:\n".format(self._name, self._pressed)
-        )
+        self._board.service_irqs()
+        self._board.events.record("SWITCH", self._name, "call", self._pressed)
         return self._pressed
 
     def callback(self, callable_func):
-        sys.stderr.write(
-            "SWITCH {}: callback {}\n".format(self._name, callable_func)
-        )
+        self._board.events.record("SWITCH", self._name, "callback", callable_func)
         self._callable = callable_func
 
+    def debounce(self, us=None):
+        """Get or set the debounce time in microseconds."""
+        if us is None:
+            return self._debounce_us
+        self._debounce_us = us
+
+    def _set_level(self, level):
+        """Move the contact; accept the edge unless it is bounce."""
+        self._level = level
+        if level == self._pressed or self._settle_event is not None:
+            return
+        clock = self._board.clock
+        last = self._last_edge_us
+        if last is not None and clock.micros() - last < self._debounce_us:
+            # Look at the level again once the switch settled
+            self._settle_event = clock.schedule(
+                last + self._debounce_us, self._settle)
+            return
+        self._edge()
+
+    def _settle(self):
+        self._settle_event = None
+        if self._level != self._pressed:
+            self._edge()
+
+    def _edge(self):
+        self._last_edge_us = self._board.clock.micros()
+        self._pressed = self._level
+        if self._pressed:
+            self._board.events.record("SWITCH", self._name, "pressed")
+            self._board.raise_irq(self._irq, None)
+        else:
+            self._board.events.record("SWITCH", self._name, "released")
+
+    def _irq(self, argument):
+        if self._callable is not None:
+            self._callable()
+
     def press(self):
-        sys.stderr.write("SWITCH {}: pressed\n".format(self._name))
-        self._pressed = True
+        """Press the switch (test hook).
+
+        The callback runs as an interrupt, i.e. right away or, if that
+        is not possible, at the next safe point of the script.
+        """
+        self._set_level(True)
 
     def release(self):
-        sys.stderr.write("SWITCH {}: released\n".format(self._name))
-        self._pressed = False
+        """Release the switch (test hook)."""
+        self._set_level(False)
+
+    def inject(self, presses, hold_us=10000):
+        """Press the switch at the given simulated times (test hook).
+
+        Parameters
+        ----------
+        presses: iterable
+            Ascending press times in microseconds. Only the next press is
+            scheduled on the clock, so long generators are fine.
+        hold_us: int
+            Time the switch is held down for each press.
+        """
+        presses = iter(presses)
+        clock = self._board.clock
+
+        def schedule_press():
+            for at_us in presses:
+                clock.schedule(at_us, press)
+                break
+
+        def press():
+            self.press()
+            clock.schedule(clock.micros() + hold_us, release)
+
+        def release():
+            self.release()
+            schedule_press()
+
+        schedule_press()
 
     def update(self):
-        if self._pressed and self._callable is not None:
-            self._callable()
+        """Run the pending callbacks.
+
+        Kept for scripts written before callbacks were interrupt driven;
+        it is only a safe point now.
+        """
+        self._board.service_irqs()
 
 
 class ADC:
@@ -523,10 +1910,11 @@ class ADC:
     http://docs.micropython.org/en/latest/library/pyb.ADC.html"""
 
     def __init__(self, pin):
-        _check_pin_availability(pin)
+        self._board = current_board()
+        self._board.claim_pin(pin, self)
+        self._board.register(self)
         self._pin = pin
-
-        self._value = randint(0, 4095)
+        self._channel = 'adc.{}'.format(pin)
 
     def read(self):
         """Read the value on the analog pin and return it
@@ -537,7 +1925,8 @@ class ADC:
             Value between 0 and 4095
         """
 
-        return self._value
+        board = self._board
+        return board.signal(self._channel).sample(board.clock.micros())
 
     def read_timed(self, buf, timer):
         """Read analog values into buf at a rate set by the timer object.
@@ -557,11 +1946,29 @@ class ADC:
 
         Returns
         -------
+        out: ArrayType
+            The same buffer, filled with the samples.
 
+        The simulated clock advances by the duration of the acquisition,
+        i.e. len(buf) / timer.freq() seconds.
         """
-        _timer = timer
-        for j in range(len(buf)):
-            buf[j] = randint(0, 1)
+        view = memoryview(buf)
+        if view.format not in ('B', 'H', 'I', 'L', 'Q', 'h', 'i', 'l', 'q'):
+            view = view.cast('B')
+        count = len(view)
+        freq = timer._rate()
+
+        clock = self._board.clock
+        source = self._board.signal(self._channel)
+        samples = source.samples_at(clock.micros(), count, freq)
+        if count and (min(samples) < 0 or max(samples) > 4095):
+            samples = [min(max(value, 0), 4095) for value in samples]
+
+        if view.itemsize == 1:
+            samples = [value >> 4 for value in samples]
+
+        view[:] = array(view.format, samples)
+        clock.advance(count * 1000000 // freq)
 
         return buf
 
@@ -638,11 +2045,13 @@ class DAC:
             else:
                 raise Exception("Allocated Pin cannot be used for DAC.")
         elif isinstance(port, Pin):
-            pin_name = port.name
+            pin_name = port.name()
         else:
             raise Exception("Allocated Pin is not of valid type.")
 
-        _check_pin_availability(pin_name)
+        self._board = current_board()
+        self._board.claim_pin(pin_name, self)
+        self._board.register(self)
         self.port = port
 
         # Check bits input validity
@@ -657,6 +2066,14 @@ class DAC:
         # Values defined in subsequent methods
         self.value = None
 
+        # Output trace: segments starting at _trace_times hold the value
+        # in _trace_values, or are driven by the signal source stored
+        # under their index in _trace_sources (write_timed, noise,
+        # triangle). Samples are only generated when read.
+        self._trace_times = array('q', [0])
+        self._trace_values = array('l', [0])
+        self._trace_sources = {}
+
     def init(self):
         raise NotImplementedError()
 
@@ -664,17 +2081,39 @@ class DAC:
         """De-initialise the DAC making its pin available for other uses."""
         raise NotImplementedError()
 
+    def _drive(self, source=None, value=0):
+        """Drive the output from the source, or hold value, from now on."""
+        times = self._trace_times
+        sources = self._trace_sources
+        now = self._board.clock.micros()
+        last = len(times) - 1
+        if times[last] == now:
+            sources.pop(last, None)
+            self._trace_values[last] = value
+        elif source is None and last not in sources and \
+                self._trace_values[last] == value:
+            return
+        else:
+            times.append(now)
+            self._trace_values.append(value)
+            last += 1
+        if source is not None:
+            sources[last] = source
+
     def noise(self, freq):
         """Generate a pseudo-random noise signal.
 
         A new random sample is written to the DAC output at the given frequency."""
-        raise NotImplementedError()
+        seed = self._board.seed ^ zlib.crc32(b'dac') ^ len(self._trace_times)
+        self._drive(Noise(0, 2 ** self.bits - 1, seed=seed, rate=freq))
 
     def triangle(self, freq):
         """Generate a triangle wave.
 
         The value on the DAC output changes at the given frequency, and the frequency of the repeating triangle wave itself is 2048 times smaller."""
-        raise NotImplementedError()
+        top = 2 ** self.bits - 1
+        ramp = [top * i // 1023 for i in range(1024)]
+        self._drive(Recorded(ramp + ramp[::-1], rate=freq))
 
     def write(self, value):
         """Direct access to the DAC output.
@@ -693,7 +2132,12 @@ class DAC:
         elif value > 2 ** self.bits -1:
             raise Exception('Given value is too large.')
 
+        if value != self.value:
+            tracer = self._board.tracer
+            if tracer is not None:
+                tracer.change('dac.{}'.format(self.port), value)
         self.value = value
+        self._drive(value=value)
 
     def write_timed(self, data, freq, mode=NORMAL):
         """Initiates a burst of RAM to DAC using a DMA transfer.
@@ -710,20 +2154,194 @@ class DAC:
             An already-initialised Timer object which is used to trigger
             the DAC sample. Valid timers are 2, 4, 5, 6, 7 and 8.
         mode: NORMAL or CIRCULAR
+            NORMAL outputs the data once and then holds the last value,
+            CIRCULAR repeats the data until the output is changed.
         """
-        data = bytes([self.bits])
+        if isinstance(freq, Timer):
+            freq = freq._rate()
+
+        view = memoryview(data)
+        if self.bits == 12 and view.itemsize == 1:
+            view = view.cast('H')
+        elif self.bits == 8 and view.itemsize != 1:
+            view = view.cast('B')
+
+        self._drive(Recorded(view, rate=freq, loop=mode == self.CIRCULAR))
+
+    def output(self, start, stop, rate=None):
+        """Return the DAC output between two timestamps.
+
+        Parameters
+        ----------
+        start: int
+            First timestamp in microseconds (inclusive).
+        stop: int
+            Last timestamp in microseconds (exclusive).
+        rate: int, optional
+            Number of samples per second of the returned trace.
+            Defaults to the fastest sample rate driving the output in the
+            requested interval.
+
+        Returns
+        -------
+        out: array
+            Array of signed longs ('l'). Use
+            ``numpy.frombuffer(out, dtype='l')`` for a NumPy view without
+            a copy.
+        """
+        times = self._trace_times
+        values = self._trace_values
+        sources = self._trace_sources
+
+        # Segments overlapping [start, stop)
+        first = max(bisect_right(times, start) - 1, 0)
+        last = bisect_left(times, stop)
+        if rate is None:
+            # Held values are sampled at 1 kHz, as Constant sources
+            rate = max([1000] + [sources[i].rate for i in sources
+                                 if first <= i < last])
+
+        total = max(0, (stop - start) * rate // 1000000)
+        out = array('l', [0]) * total
+        for i in range(first, last):
+            begin = times[i]
+            end = times[i + 1] if i + 1 < len(times) else stop
+            k_first = max(0, -((begin - start) * rate // -1000000))
+            k_end = min(total, -((end - start) * rate // -1000000))
+            if k_end <= k_first:
+                continue
+            source = sources.get(i)
+            if source is None:
+                out[k_first:k_end] = array('l', [values[i]]) * (
+                    k_end - k_first)
+            else:
+                local_us = start + k_first * 1000000 // rate - begin
+                out[k_first:k_end] = source.samples_at(
+                    local_us, k_end - k_first, rate)
+
+        return out
+
+
+class I2CDevice:
+    """Simulated I2C slave with a memory (register) map.
+
+    A plain write sets the register pointer from its first
+    ``addr_size`` bits and stores the remaining bytes from there on;
+    a plain read continues at the register pointer. The pointer
+    increments with every byte and wraps at the end of the memory.
+    Subclasses may override the methods for devices with side effects.
+    """
+
+    def __init__(self, size=256, addr_size=8, fill=0x00):
+        """
+
+        Parameters
+        ----------
+        size: int
+            Size of the memory in bytes.
+        addr_size: int
+            Width of the register addresses in bits (8 or 16).
+        fill: int
+            Initial value of all bytes.
+        """
+        self.memory = bytearray([fill]) * size
+        self.addr_size = addr_size
+        self.pointer = 0
+
+    def mem_read(self, memaddr, buf):
+        """Copy the memory starting at memaddr into buf."""
+        memory = self.memory
+        size = len(memory)
+        count = len(buf)
+        memaddr %= size
+        self.pointer = (memaddr + count) % size
+        done = 0
+        while done < count:
+            chunk = min(count - done, size - memaddr)
+            buf[done:done + chunk] = memory[memaddr:memaddr + chunk]
+            done += chunk
+            memaddr = 0
+
+    def mem_write(self, memaddr, data):
+        """Copy data into the memory starting at memaddr."""
+        memory = self.memory
+        size = len(memory)
+        count = len(data)
+        memaddr %= size
+        self.pointer = (memaddr + count) % size
+        done = 0
+        while done < count:
+            chunk = min(count - done, size - memaddr)
+            memory[memaddr:memaddr + chunk] = data[done:done + chunk]
+            done += chunk
+            memaddr = 0
+
+    def recv(self, buf):
+        """Answer a read of the master into buf."""
+        self.mem_read(self.pointer, buf)
+
+    def send(self, data):
+        """Handle a write of the master."""
+        width = self.addr_size // 8
+        if len(data) < width:
+            return
+        self.pointer = int.from_bytes(data[:width], 'big') % len(self.memory)
+        self.mem_write(self.pointer, data[width:])
+
+
+class EEPROM(I2CDevice):
+    """I2C EEPROM, e.g. a 24LC32 (4KB, 16-bit addresses).
+
+    Erased cells read 0xFF.
+    """
+
+    def __init__(self, size=4096, addr_size=16):
+        super().__init__(size, addr_size, fill=0xFF)
+
+
+class RegisterMap(I2CDevice):
+    """I2C sensor exposing a register map.
+
+    Parameters
+    ----------
+    registers: dict
+        Initial register values, e.g. {0x0F: 0x33} for a WHO_AM_I
+        register.
+    """
 
-        self.value = data
-        raise NotImplementedError()
+    def __init__(self, registers=None, size=256):
+        super().__init__(size, 8)
+        for memaddr, value in (registers or {}).items():
+            self.memory[memaddr] = value
+
+    def __setitem__(self, memaddr, value):
+        self.memory[memaddr] = value
+
+    def __getitem__(self, memaddr):
+        return self.memory[memaddr]
 
 
 class I2C:
-    """http://docs.micropython.org/en/latest/library/pyb.I2C.html"""
+    """http://docs.micropython.org/en/latest/library/pyb.I2C.html
+
+    Slave devices are simulated by I2CDevice objects attached to the bus
+    with ``attach``. The board has one I2C object per bus: ``I2C(bus)``
+    returns the same object (initialised again if parameters are given),
+    so every part of a script sees the same devices.
+    """
 
     MASTER = 0
     SLAVE = 1
 
-    def __init__(self, bus, *args):
+    def __new__(cls, bus, *args, **kwargs):
+        return current_board().fixed_peripheral(cls, bus)
+
+    def __init__(self, bus, *args, **kwargs):
+        if '_board' in vars(self):
+            if args or kwargs:
+                self.init(*args, **kwargs)
+            return
+
         self._bus = bus
 
         # Pyboard connections
@@ -740,10 +2358,33 @@ class I2C:
         # Parameters
         self._mode = None
         self._addr = None
-        self._baudrate = None
+        self._baudrate = 400000
         self._gencall = None
         self._dma = None
 
+        self._board = current_board()
+        self._board.register(self)
+        # Attached devices, indexed by their address
+        self._devices = {}
+
+        if args or kwargs:
+            self.init(*args, **kwargs)
+
+    def attach(self, addr, device):
+        """Connect a simulated slave device to the bus (test hook).
+
+        Parameters
+        ----------
+        addr: int
+            7-bit address of the device.
+        device: I2CDevice
+        """
+        self._devices[addr] = device
+
+    def detach(self, addr):
+        """Disconnect the device at addr from the bus (test hook)."""
+        self._devices.pop(addr, None)
+
     def deinit(self):
         """Turn off the I2C bus."""
         raise NotImplementedError()
@@ -769,7 +2410,7 @@ class I2C:
             (note that DMA transfers have more precise timing but
             currently do not handle bus errors properly)
         """
-        if self._mode in [self.MASTER, self.SLAVE]:
+        if mode in [self.MASTER, self.SLAVE]:
             self._mode = mode
         else:
             raise AttributeError('Must be either MASTER or Slave')
@@ -779,6 +2420,17 @@ class I2C:
         self._gencall = gencall
         self._dma = dma
 
+    def _device(self, addr):
+        """Return the device at addr or raise the pyboard bus error."""
+        device = self._devices.get(addr)
+        if device is None:
+            raise OSError(errno.EIO, 'Address not active.')
+        return device
+
+    def _transfer_time(self, nbytes):
+        """Advance the clock by the time nbytes (plus address) take."""
+        self._board.clock.advance((nbytes + 1) * 9 * 1000000 // self._baudrate)
+
     def is_ready(self, addr):
         """Check if an I2C device responds to the given address.
 
@@ -786,8 +2438,8 @@ class I2C:
 
         Parameters
         ----------
-        addr : str
-            I2C address (in hexadecimal) to be investigated.
+        addr : int
+            I2C address to be investigated.
 
         Returns
         -------
@@ -795,12 +2447,67 @@ class I2C:
             True, if an I2C device responds to the given address.
             False, otherwise
         """
+        return addr in self._devices
 
     def mem_read(self, data, addr, memaddr, timeout=5000, addr_size=8):
-        raise NotImplementedError()
+        """Read from the memory of an I2C device.
+
+        Parameters
+        ----------
+        data: int or buffer
+            Number of bytes to read or a buffer to read into.
+        addr: int
+            The I2C device address.
+        memaddr: int
+            The memory location within the I2C device.
+        timeout: int
+            Timeout in milliseconds to wait for the read.
+        addr_size: int
+            Width of memaddr in bits, 8 or 16.
+
+        Returns
+        -------
+        out: bytes or buffer
+            If data is an integer then a new buffer of the bytes read.
+            Otherwise, the same buffer that was passed in to data.
+        """
+        device = self._device(addr)
+        if type(data) is int:
+            out = bytearray(data)
+        else:
+            out = data
+
+        view = memoryview(out).cast('B')
+        device.mem_read(memaddr, view)
+        self._transfer_time(len(view) + addr_size // 8 + 1)
+
+        if type(data) is int:
+            return bytes(out)
+        return out
 
     def mem_write(self, data, addr, memaddr, timeout=5000, addr_size=8):
-        raise NotImplementedError()
+        """Write to the memory of an I2C device.
+
+        Parameters
+        ----------
+        data: int or buffer
+            An integer (written as one byte) or a buffer to write.
+        addr: int
+            The I2C device address.
+        memaddr: int
+            The memory location within the I2C device.
+        timeout: int
+            Timeout in milliseconds to wait for the write.
+        addr_size: int
+            Width of memaddr in bits, 8 or 16.
+        """
+        device = self._device(addr)
+        if type(data) is int:
+            data = bytes([data])
+
+        view = memoryview(data).cast('B')
+        device.mem_write(memaddr, view)
+        self._transfer_time(len(view) + addr_size // 8)
 
     def recv(self, recv, addr=0x00, timeout=5000):
         """
@@ -811,7 +2518,7 @@ class I2C:
             Can be:
                 an integer, which is the number of bytes to receive
                 a mutable buffer, which will be filled with received bytes
-        addr: str
+        addr: int
             The address to receive from (only required in master mode)
         timeout: int
              Timeout in milliseconds to wait for the receive.
@@ -824,15 +2531,17 @@ class I2C:
         """
 
         if type(recv) is int:
-            out = bytes(recv)
+            out = bytearray(recv)
         elif type(recv) is bytearray:
             out = recv
         else:
             raise TypeError('Argument should be of type int or bytearray.')
 
-        if self.is_ready(addr):
-            raise OSError('Address not active.')
+        self._device(addr).recv(memoryview(out))
+        self._transfer_time(len(out))
 
+        if type(recv) is int:
+            return bytes(out)
         return out
 
     def send(self, send, addr=0x00, timeout=5000):
@@ -842,15 +2551,18 @@ class I2C:
         ----------
         send: int, bytearray
             Data to send (an integer to send, or a buffer object)
-        addr: bytearray
+        addr: int
             The address to send to (only required in master mode)
         timeout: int
              Timeout in milliseconds to wait for the receive.
         """
-        if type(send) not in [int, bytearray]:
+        if type(send) is int:
+            send = bytes([send])
+        elif type(send) not in [bytes, bytearray]:
             raise TypeError('Argument should be of type int or bytearray.')
-        if addr is not self._addr:
-            raise Exception("Address is not active.")
+
+        self._device(addr).send(memoryview(send))
+        self._transfer_time(len(send))
 
     def scan(self):
         """Scan all I2C addresses and return active ones.
@@ -863,15 +2575,7 @@ class I2C:
         out : list
             List of I2C addresses that respond
         """
-        active_addresses = []
-
-        inspected_addresses_list = range(1, 128)
-        for integer in inspected_addresses_list:
-            address = hex(integer)
-            if self.is_ready(address):
-                active_addresses.append(address)
-
-        return active_addresses
+        return sorted(addr for addr in self._devices if 0x01 <= addr <= 0x7f)
 
 
 class PinAF:
@@ -897,32 +2601,292 @@ class Servo:
         raise NotImplementedError()
 
 
+class SPIDevice:
+    """Base class of simulated SPI slaves.
+
+    A device answers full-duplex transfers: for every byte shifted out
+    by the master one byte is shifted in. A transaction lasts from
+    ``select`` to ``deselect``; without a chip select pin every SPI call
+    is a transaction of its own.
+    """
+
+    def select(self):
+        """Start of a transaction (chip select went low)."""
+
+    def deselect(self):
+        """End of a transaction (chip select went high)."""
+
+    def transfer(self, tx, rx):
+        """Handle the bytes sent by the master.
+
+        Parameters
+        ----------
+        tx: memoryview
+            Bytes sent by the master.
+        rx: memoryview
+            Writable, same length as tx: the bytes to answer.
+        """
+        rx[:] = bytes(len(tx))
+
+
+class ShiftRegister(SPIDevice):
+    """Chain of ``length`` 8-bit shift registers (e.g. 74HC595).
+
+    Shifted in bytes push the current content out on MISO, so the
+    master reads back what it sent ``length`` bytes earlier.
+    """
+
+    def __init__(self, length=1):
+        self.length = length
+        self.register = bytearray(length)
+
+    def transfer(self, tx, rx):
+        stream = self.register + tx
+        count = len(tx)
+        rx[:] = stream[:count]
+        self.register = stream[count:]
+
+
+class SPIFlash(SPIDevice):
+    """Serial NOR flash (e.g. W25Q80) with the basic command set.
+
+    Supported commands: 0x9F read JEDEC id, 0x05 read status,
+    0x06 write enable, 0x04 write disable, 0x03 read, 0x02 page program,
+    0x20 sector (4KB) erase and 0xC7 chip erase.
+    """
+
+    JEDEC_ID = b'\xef\x40\x14'
+
+    def __init__(self, size=1024 * 1024):
+        self.memory = bytearray(b'\xff') * size
+        self.write_enabled = False
+        self._command = None
+        self._header = bytearray()
+        self._address = 0
+
+    def select(self):
+        self._command = None
+        self._header = bytearray()
+
+    def deselect(self):
+        command = self._command
+        if command == 0x20 and len(self._header) == 3 and self.write_enabled:
+            start = self._address - self._address % 4096
+            self.memory[start:start + 4096] = b'\xff' * 4096
+        elif command == 0xC7 and self.write_enabled:
+            self.memory[:] = b'\xff' * len(self.memory)
+        if command in (0x02, 0x20, 0xC7):
+            self.write_enabled = False
+        self.select()
+
+    def transfer(self, tx, rx):
+        count = len(tx)
+        index = 0
+        if self._command is None and count:
+            self._command = tx[0]
+            rx[0] = 0xFF
+            index = 1
+            if self._command == 0x06:
+                self.write_enabled = True
+            elif self._command == 0x04:
+                self.write_enabled = False
+
+        command = self._command
+        if command in (0x03, 0x02, 0x20) and len(self._header) < 3:
+            needed = min(3 - len(self._header), count - index)
+            self._header += tx[index:index + needed]
+            rx[index:index + needed] = b'\xff' * needed
+            index += needed
+            if len(self._header) == 3:
+                self._address = int.from_bytes(self._header, 'big') % len(
+                    self.memory)
+
+        remaining = count - index
+        if not remaining:
+            return
+
+        if command == 0x03 and len(self._header) == 3:
+            self._read(rx[index:])
+        elif command == 0x02 and len(self._header) == 3:
+            self._program(tx[index:])
+            rx[index:] = b'\xff' * remaining
+        elif command == 0x9F:
+            rx[index:] = (self.JEDEC_ID * (remaining // 3 + 1))[:remaining]
+        elif command == 0x05:
+            rx[index:] = bytes([self.write_enabled << 1]) * remaining
+        else:
+            rx[index:] = b'\xff' * remaining
+
+    def _read(self, rx):
+        memory = self.memory
+        address = self._address
+        done = 0
+        while done < len(rx):
+            chunk = min(len(rx) - done, len(memory) - address)
+            rx[done:done + chunk] = memory[address:address + chunk]
+            done += chunk
+            address = (address + chunk) % len(memory)
+        self._address = address
+
+    def _program(self, tx):
+        if not self.write_enabled:
+            return
+        memory = self.memory
+        address = self._address
+        done = 0
+        while done < len(tx):
+            # Page program wraps around within its 256 byte page.
+            page_end = address - address % 256 + 256
+            chunk = min(len(tx) - done, page_end - address)
+            old = int.from_bytes(memory[address:address + chunk], 'big')
+            new = int.from_bytes(tx[done:done + chunk], 'big')
+            memory[address:address + chunk] = (old & new).to_bytes(
+                chunk, 'big')
+            done += chunk
+            address += chunk
+            if address == page_end:
+                address -= 256
+        self._address = address
+
+
+class DisplayController(SPIDevice):
+    """Write-only display controller (e.g. SSD1306, ST7735).
+
+    Bytes sent while the D/C pin is low are collected in ``commands``,
+    the others in ``data``. Without a D/C pin all bytes are data.
+    """
+
+    def __init__(self, dc=None):
+        """
+
+        Parameters
+        ----------
+        dc: Pin, optional
+            The data/command pin.
+        """
+        self.dc = dc
+        self.commands = bytearray()
+        self.data = bytearray()
+
+    def transfer(self, tx, rx):
+        if self.dc is not None and not self.dc.value():
+            self.commands += tx
+        else:
+            self.data += tx
+        rx[:] = bytes(len(tx))
+
+
 class SPI:
-    """http://docs.micropython.org/en/latest/library/pyb.SPI.html"""
+    """http://docs.micropython.org/en/latest/library/pyb.SPI.html
 
-    # ToDO: finish
+    Slave devices are simulated by SPIDevice objects attached with
+    ``attach``. Without a device the received bytes are read from the
+    bus signal source.
+    """
 
     MASTER = 0
     SLAVE = 1
     LSB = 2
     MSB = 3
 
-    def __init__(self, bus, mode, **kwargs):
+    def __init__(self, bus, mode=None, **kwargs):
 
         self.bus = bus
         self.mode = mode
+        self.baudrate = 328125
+        self.bits = 8
 
         self._sent_data = None
         self._out_data = None
 
-        if kwargs:
-            self.init(kwargs)
+        self._board = current_board()
+        self._board.register(self)
+        self._channel = 'spi{}'.format(bus)
+        self._rx_index = 0
+
+        self._device = None
+        self._cs = None
+
+        if mode is not None:
+            self.init(mode, **kwargs)
 
     def deinit(self):
         raise NotImplementedError()
 
-    def init(self, kwargs):
-        raise NotImplementedError()
+    def init(self, mode, baudrate=328125, prescaler=None, polarity=1,
+             phase=0, bits=8, firstbit=MSB, ti=False, crc=None):
+        """Initialise the SPI bus.
+
+        Parameters
+        ----------
+        mode: int
+            SPI.MASTER or SPI.SLAVE.
+        baudrate: int
+            SCK clock rate (only sensible for a master).
+        prescaler: int, optional
+            Prescaler of the bus clock, overrides baudrate if given.
+        polarity: int
+            Idle level of the clock line, 0 or 1.
+        phase: int
+            Sample data on the first (0) or second (1) clock edge.
+        bits: int
+            Word size, 8 or 16.
+        firstbit: int
+            SPI.MSB or SPI.LSB.
+        ti: bool
+            Use TI mode instead of Motorola.
+        crc: int, optional
+            CRC polynomial, None to disable.
+        """
+        self.mode = mode
+        if prescaler is not None:
+            baudrate = 84000000 // prescaler
+        self.baudrate = baudrate
+        self.polarity = polarity
+        self.phase = phase
+        self.bits = bits
+        self.firstbit = firstbit
+        self.ti = ti
+        self.crc = crc
+
+    def attach(self, device, cs=None):
+        """Connect a simulated slave device to the bus (test hook).
+
+        Parameters
+        ----------
+        device: SPIDevice
+        cs: Pin, optional
+            Chip select pin. If given, a transaction lasts while the pin
+            is low; otherwise every call is a transaction.
+        """
+        board = self._board
+        if self._cs is not None:
+            board.unwatch_pin(self._cs.name(), self._chip_select)
+
+        self._device = device
+        self._cs = cs
+        if cs is not None:
+            board.watch_pin(cs.name(), self._chip_select)
+
+    def _chip_select(self, pin_name, value):
+        if value:
+            self._device.deselect()
+        else:
+            self._device.select()
+
+    def _transfer(self, tx, rx):
+        """Shift tx out and rx in, both memoryviews of equal length."""
+        device = self._device
+        if device is None:
+            rx[:] = self._read_samples(len(rx))
+        elif self._cs is None:
+            device.select()
+            device.transfer(tx, rx)
+            device.deselect()
+        else:
+            device.transfer(tx, rx)
+
+        self._board.clock.advance(len(tx) * 8 * 1000000 // self.baudrate)
 
     def send(self, data, timeout=5000):
         """Send data on the bus,
@@ -935,8 +2899,13 @@ class SPI:
             Milliseconds to wait for the send.
         """
         _timeout = timeout
+        if type(data) == int:
+            data = bytes([data])
         self._sent_data = data
 
+        tx = memoryview(data).cast('B')
+        self._transfer(tx, memoryview(bytearray(len(tx))))
+
     def recv(self, recv, timeout=5000):
         """Receive data on the bus.
 
@@ -956,12 +2925,11 @@ class SPI:
                 otherwise the same buffer that was passed in to recv.
         """
         if type(recv) == int:
-            self._out_data = []
-            for j in range(recv):
-                self._out_data.append(randint(0, 1))
-        else:
-            address = randint(0, 255)
-            self._out_data = bytes([address, 0])
+            recv = bytearray(recv)
+
+        rx = memoryview(recv).cast('B')
+        self._transfer(memoryview(bytes(len(rx))), rx)
+        self._out_data = recv
 
         return self._out_data
 
@@ -984,60 +2952,236 @@ class SPI:
         out : buffer
             Received bytes.
         """
-
-        self.send(send)
         _timeout = timeout
+        if type(send) == int:
+            send = bytes([send])
+        self._sent_data = send
 
-        if recv:
-            for j in range(len(recv)):
-                recv[j] = randint(0, 1)
-        else:
-            address = randint(0, 255)
-            self._out_data = bytes([address, 0])
+        if recv is None:
+            recv = bytearray(len(send))
+
+        tx = memoryview(send).cast('B')
+        rx = memoryview(recv).cast('B')
+        if recv is send:
+            # The received bytes overwrite the sent ones.
+            tx = memoryview(bytes(tx))
+        self._transfer(tx, rx)
+        self._out_data = recv
 
         return self._out_data
 
+    def _read_samples(self, count):
+        """Take the next ``count`` received bytes from the bus signal."""
+        source = self._board.signal(self._channel)
+        index = max(source.index(self._board.clock.micros()), self._rx_index)
+        self._rx_index = index + count
+        return array('B', source.samples(index, count))
+
 
 class Timer:
     """
 
-    http://docs.micropython.org/en/latest/library/pyb.Timer.html"""
-
-    PWM = Mock()
-    PWM_INVERTED = Mock()
-    OC_TIMING = Mock()
-    OC_CTIVE = Mock()
-    OC_INACTIVE = Mock()
-    OC_TOGGLE = Mock()
-    OC_FORCE_ACTIVE = Mock()
-    OF_FORCED_INACTIVE = Mock()
-    I2C = Mock()
-    ENC_A = Mock()
-    ENC_B = Mock()
-    ENC_AB = Mock()
-
-    def __init__(self, pin_id, freq=100, prescaler=83, period=999):
-        """Construct a new timer object of the given id."""
+    http://docs.micropython.org/en/latest/library/pyb.Timer.html
+
+    The counter runs on the simulated clock: ``counter()`` is derived
+    from the time elapsed since the timer was initialised, and the
+    callback is scheduled on the clock at every counter overflow.
+    ``freq``, ``prescaler`` and ``period`` always satisfy
+    freq = source_freq / (prescaler + 1) / (period + 1).
+    """
+
+    # Channel modes
+    PWM = 0
+    PWM_INVERTED = 1
+    OC_TIMING = 2
+    OC_ACTIVE = 3
+    OC_INACTIVE = 4
+    OC_TOGGLE = 5
+    OC_FORCED_ACTIVE = 6
+    OC_FORCED_INACTIVE = 7
+    IC = 8
+    ENC_A = 9
+    ENC_B = 10
+    ENC_AB = 11
+
+    # Former misspelled names
+    OC_CTIVE = OC_ACTIVE
+    OC_FORCE_ACTIVE = OC_FORCED_ACTIVE
+    OF_FORCED_INACTIVE = OC_FORCED_INACTIVE
+    I2C = IC
+
+    UP = 0
+    DOWN = 1
+    CENTER = 2
+
+    def __new__(cls, pin_id, *args, **kwargs):
+        return current_board().fixed_peripheral(cls, pin_id)
+
+    def __init__(self, pin_id, freq=None, prescaler=None, period=None,
+                 **kwargs):
+        """Construct a new timer object of the given id.
+
+        The board has one timer per id: ``Timer(id)`` returns the same
+        object, initialised again (which disables its callback unless a
+        new one is given) if any parameter is given. If no frequency,
+        prescaler or period is given, a new timer runs at 100Hz.
+        """
+        if '_board' in vars(self):
+            if freq is not None or prescaler is not None or \
+                    period is not None or kwargs:
+                self.init(freq=freq, prescaler=prescaler, period=period,
+                          **kwargs)
+            return
+
         self._id = pin_id
 
-        self.timer_frequency = freq
-        self.timer_prescaler = prescaler
-        self.timer_period = period
+        self._board = current_board()
+        self._board.register(self)
 
-        self.counter = None
+        self._callback = None
+        self._event = None
+        self._running = False
 
-    def init(self):
-        raise NotImplementedError()
+        if freq is None and (prescaler is None or period is None):
+            freq = 100
+        self.init(freq=freq, prescaler=prescaler, period=period, **kwargs)
+
+    def init(self, freq=None, prescaler=None, period=None, mode=UP, div=1,
+             callback=None, deadtime=0):
+        """Initialise the timer.
+
+        Parameters
+        ----------
+        freq: int or float, optional
+            Frequency in Hz. The prescaler and period are computed from
+            it.
+        prescaler: int, optional
+            Used together with period if freq is not given.
+        period: int, optional
+            Used together with prescaler if freq is not given.
+        mode: int
+            Timer.UP, Timer.DOWN or Timer.CENTER.
+        div: int
+            Clock division of the digital filters.
+        callback: callable, optional
+            Called with the timer object at every overflow.
+        deadtime: int
+            Dead time between complementary outputs.
+        """
+        self.mode = mode
+        self.div = div
+        self.deadtime = deadtime
+
+        if freq is not None:
+            self.timer_prescaler, self.timer_period = self._split(freq)
+        elif prescaler is not None and period is not None:
+            self.timer_prescaler = prescaler
+            self.timer_period = period
+        else:
+            raise ValueError("Either freq or prescaler and period are needed.")
+
+        self._running = True
+        self._restart(0)
+        self.callback(callback)
 
     def deinit(self):
-        raise NotImplementedError()
+        """Deinitialise the timer: the counter and callback stop."""
+        self.callback(None)
+        self._counter_offset = self.counter()
+        self._running = False
+
+    def _split(self, freq):
+        """Compute (prescaler, period) for a frequency, like the pyboard."""
+        source = self.source_freq()
+        if freq <= 0:
+            raise ValueError("Frequency must be positive.")
+        ticks = max(int(round(source / freq)), 1)
+        period_max = 0xffffffff if self._id in (2, 5) else 0xffff
+
+        prescaler = 1
+        while ticks > period_max + 1:
+            # Prefer exact divisions, as the pyboard firmware does.
+            if ticks % 5 == 0:
+                prescaler *= 5
+                ticks //= 5
+            elif ticks % 3 == 0:
+                prescaler *= 3
+                ticks //= 3
+            else:
+                prescaler *= 2
+                ticks //= 2
+        if prescaler > 0x10000:
+            raise ValueError("Frequency is too low for this timer.")
+        return prescaler - 1, ticks - 1
 
-    def callback(self):
-        raise NotImplementedError()
+    def _ticks(self):
+        """Return the number of source clock ticks of one timer period."""
+        return (self.timer_prescaler + 1) * (self.timer_period + 1)
+
+    def _rate(self):
+        """Return the exact frequency, for sample index arithmetic.
+
+        An int, or a Fraction when the source clock does not divide
+        evenly (``freq()`` then returns a float, as on the pyboard).
+        """
+        source, ticks = self.source_freq(), self._ticks()
+        if source % ticks:
+            # Imported here, it is slow to import and rarely needed
+            from fractions import Fraction
+            return Fraction(source, ticks)
+        return source // ticks
+
+    def _elapsed_counts(self):
+        """Return the number of counter increments since the restart."""
+        elapsed_us = self._board.clock.micros() - self._start_us
+        return (elapsed_us * self.source_freq()
+                // (1000000 * (self.timer_prescaler + 1)))
+
+    def _restart(self, counter):
+        """Restart counting from counter, e.g. after a parameter change."""
+        self._start_us = self._board.clock.micros()
+        self._counter_offset = counter
+        if self._callback is not None:
+            self._schedule()
+
+    def _schedule(self):
+        """Schedule the callback at the next counter overflow."""
+        clock = self._board.clock
+        if self._event is not None:
+            clock.cancel(self._event)
+
+        counts = self._counter_offset + self._elapsed_counts()
+        overflows = counts // (self.timer_period + 1) + 1
+        ticks = (overflows * (self.timer_period + 1) - self._counter_offset
+                 ) * (self.timer_prescaler + 1)
+        due = self._start_us - (-ticks * 1000000 // self.source_freq())
+        self._event = clock.schedule(due, self._overflow)
+
+    def _overflow(self):
+        self._event = None
+        callback = self._callback
+        self._schedule()
+        self._board.raise_irq(callback, self)
+
+    def callback(self, fun):
+        """Set the function to be called when the timer triggers.
+
+        Parameters
+        ----------
+        fun: callable
+            Called with the timer object as argument. If None, the
+            callback is disabled.
+        """
+        if self._event is not None:
+            self._board.clock.cancel(self._event)
+            self._event = None
+
+        self._callback = fun
+        if fun is not None and self._running:
+            self._schedule()
 
-    @staticmethod
-    def channel(channel, mode, **kwargs):
-        return TimerChannel(channel, mode, **kwargs)
+    def channel(self, channel, mode, **kwargs):
+        return TimerChannel(channel, mode, timer=self, **kwargs)
 
     def counter(self, value=None):
         """Get or set the timer counter.
@@ -1052,14 +3196,17 @@ class Timer:
         out: int
         """
         if value is not None:
-            self.counter = value
-        else:
-            return self.counter
+            self._restart(value)
+            return
+
+        if not self._running:
+            return self._counter_offset
+        return ((self._counter_offset + self._elapsed_counts())
+                % (self.timer_period + 1))
 
     def freq(self, value=None):
         """Get or set the frequency for the timer.
 
-        # Todo:
         Changes prescaler and period if set.
 
         Parameters
@@ -1069,12 +3216,16 @@ class Timer:
 
         Returns
         -------
-        out: int
+        out: int or float
         """
         if value is not None:
-            self.timer_frequency = value
+            self.timer_prescaler, self.timer_period = self._split(value)
+            self._restart(0)
         else:
-            return self.timer_frequency
+            source, ticks = self.source_freq(), self._ticks()
+            if source % ticks:
+                return source / ticks
+            return source // ticks
 
     def period(self, value=None):
         """Get or set the period of the timer.
@@ -1089,12 +3240,14 @@ class Timer:
         out: int
         """
         if value is not None:
+            counter = self.counter()
             self.timer_period = value
+            self._restart(counter % (value + 1))
         else:
             return self.timer_period
 
     def prescaler(self, value=None):
-        """Get or set the period of the timer.
+        """Get or set the prescaler of the timer.
 
         Parameters
         ----------
@@ -1106,30 +3259,44 @@ class Timer:
         out: int
         """
         if value is not None:
+            counter = self.counter()
             self.timer_prescaler = value
+            self._restart(counter)
         else:
             return self.timer_prescaler
 
     def source_freq(self):
         """Get the frequency of the source of the timer.
 
+        Timers 1 and 8 to 11 are clocked from APB2 (168MHz), the others
+        from APB1 (84MHz).
+
         Returns
         -------
         out: int
         """
-        return self.timer_frequency
+        if self._id in (1, 8, 9, 10, 11):
+            return 168000000
+        return 84000000
 
 
 class TimerChannel:
 
-    def __init__(self, channel, mode, **kwargs):
+    def __init__(self, channel, mode, timer=None, **kwargs):
         # Todo: finish
         self.value = None
         self.channel = channel
         self.mode = mode
 
-        if kwargs:
-            pass
+        if timer is not None:
+            self._board = timer._board
+            self._trace_name = 'timer{}.ch{}'.format(timer._id, channel)
+        else:
+            self._board = current_board()
+            self._trace_name = 'timer.ch{}'.format(channel)
+
+        if kwargs.get('pulse_width_percent') is not None:
+            self.pulse_width_percent(kwargs['pulse_width_percent'])
 
     def capture(self):
         raise NotImplementedError()
@@ -1162,35 +3329,338 @@ class TimerChannel:
         if percent is None:
             return self.value
 
+        if percent != self.value:
+            tracer = self._board.tracer
+            if tracer is not None:
+                tracer.change(self._trace_name, percent)
         self.value = percent
 
 
+class RingBuffer:
+    """Fixed capacity FIFO of bytes.
+
+    Data is copied in and out with at most two slice copies, the storage
+    is never reallocated.
+    """
+
+    def __init__(self, capacity):
+        self._data = bytearray(capacity)
+        self._capacity = capacity
+        self._head = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def capacity(self):
+        return self._capacity
+
+    def free(self):
+        """Return the number of bytes which can still be written."""
+        return self._capacity - self._count
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+
+    def write(self, data):
+        """Append as much of data as fits.
+
+        Returns
+        -------
+        out: int
+            Number of bytes written.
+        """
+        data = memoryview(data).cast('B')
+        count = min(len(data), self._capacity - self._count)
+        tail = (self._head + self._count) % self._capacity
+        first = min(count, self._capacity - tail)
+        self._data[tail:tail + first] = data[:first]
+        self._data[:count - first] = data[first:count]
+        self._count += count
+        return count
+
+    def push(self, data):
+        """Append all of data, dropping the oldest bytes to make room.
+
+        Returns
+        -------
+        out: int
+            Number of bytes dropped.
+        """
+        data = memoryview(data).cast('B')
+        dropped = max(0, len(data) - self.free())
+        if len(data) >= self._capacity:
+            data = data[len(data) - self._capacity:]
+            self.clear()
+        elif dropped:
+            self._head = (self._head + dropped) % self._capacity
+            self._count -= dropped
+        self.write(data)
+        return dropped
+
+    def readinto(self, buf, nbytes=None):
+        """Move up to len(buf) (or nbytes) bytes into buf.
+
+        Returns
+        -------
+        out: int
+            Number of bytes read.
+        """
+        buf = memoryview(buf).cast('B')
+        count = len(buf) if nbytes is None else min(nbytes, len(buf))
+        count = min(count, self._count)
+        head = self._head
+        first = min(count, self._capacity - head)
+        buf[:first] = self._data[head:head + first]
+        buf[first:count] = self._data[:count - first]
+        self._head = (head + count) % self._capacity
+        self._count -= count
+        return count
+
+    def read(self, nbytes=None):
+        """Remove and return up to nbytes (default: all) bytes."""
+        count = self._count if nbytes is None else min(nbytes, self._count)
+        out = bytearray(count)
+        self.readinto(out)
+        return bytes(out)
+
+    def find(self, byte):
+        """Return the offset of the first occurrence of byte, or -1."""
+        head = self._head
+        end = head + self._count
+        if end <= self._capacity:
+            index = self._data.find(byte, head, end)
+            return index if index < 0 else index - head
+
+        index = self._data.find(byte, head, self._capacity)
+        if index >= 0:
+            return index - head
+        index = self._data.find(byte, 0, end - self._capacity)
+        return index if index < 0 else index + self._capacity - head
+
+
 class UART:
-    """http://docs.micropython.org/en/latest/library/pyb.UART.html"""
+    """http://docs.micropython.org/en/latest/library/pyb.UART.html
+
+    Each UART has a receive ring buffer (of ``read_buf_len`` bytes) and a
+    capture of the transmitted bytes. Tests put bytes on the RX line with
+    ``feed`` and take the transmitted bytes with ``drain``. Bytes arrive
+    on the RX line at the configured baudrate; writing advances the
+    simulated clock by the transmission time. The capture keeps the last
+    ``TX_BUF_LEN`` bytes: when nobody drains it, the oldest bytes are
+    dropped (counted in ``tx_dropped``), as on a line without a receiver.
+    With ``set_tx_flow`` (used by bridges to the host) writing waits for
+    room in the capture instead.
+    """
 
     RTS = 1
     CTS = ""
 
-    def __init__(self, bus, baudrate, **kwargs):
+    TX_BUF_LEN = 4096
 
-        self.bus = bus
-        self.baudrate = baudrate
+    def __init__(self, bus, baudrate=9600, **kwargs):
 
-        if kwargs:
-            self.init(kwargs)
+        self.bus = bus
 
         self._read_buf = None
         self._written_buf = None
 
-    def init(self, kwargs):
-        raise NotImplementedError()
+        self._board = current_board()
+        self._board.register(self)
+
+        # Bytes fed by tests and not yet arrived in the RX buffer.
+        self._rx_line = bytearray()
+        self._rx_line_pos = 0
+        self._rx_line_start = 0
+        self._rx_line_done = 0
+
+        self._tx = RingBuffer(self.TX_BUF_LEN)
+        self._tx_flow = False
+        self.overruns = 0
+        self.tx_dropped = 0
+
+        # feed and drain may be called from another thread (e.g. a
+        # bridge to the host), the lock guards the RX line and TX buffer.
+        self._lock = threading.Lock()
+        self._tx_space = threading.Condition(self._lock)
+
+        self.init(baudrate, **kwargs)
+
+    def init(self, baudrate, bits=8, parity=None, stop=1, timeout=0,
+             flow=0, timeout_char=0, read_buf_len=64):
+        """Initialise the UART bus with the given parameters.
+
+        Parameters
+        ----------
+        baudrate: int
+            Clock rate.
+        bits: int
+            Number of bits per character, 7, 8 or 9.
+        parity: int, optional
+            None, 0 (even) or 1 (odd).
+        stop: int
+            Number of stop bits, 1 or 2.
+        timeout: int
+            Milliseconds to wait for the first character.
+        flow: int
+            Flow control type.
+        timeout_char: int
+            Milliseconds to wait between characters.
+        read_buf_len: int
+            Size of the receive buffer in bytes.
+        """
+        self.baudrate = baudrate
+        self.bits = bits
+        self.parity = parity
+        self.stop = stop
+        self.timeout = timeout
+        self.flow = flow
+        self.timeout_char = timeout_char
+
+        self._frame_bits = 1 + bits + (parity is not None) + stop
+        self._char_us = self._frame_bits * 1000000 / baudrate
+        self._rx = RingBuffer(read_buf_len)
 
     def deinit(self):
         raise NotImplementedError()
 
+    def feed(self, data):
+        """Put bytes on the RX line (test hook).
+
+        The bytes arrive in the receive buffer one character time after
+        the other, starting now or after the bytes fed before. Bytes
+        arriving while the receive buffer is full are lost and counted
+        in ``overruns``.
+
+        Returns
+        -------
+        out: int
+            Number of bytes fed.
+        """
+        with self._lock:
+            now = self._board.clock.micros()
+            pending = len(self._rx_line) - self._rx_line_pos
+            if self._arrived(now) >= pending:
+                # The line is idle: the new bytes start arriving now.
+                self._rx_line_start = now
+                self._rx_line_done = -pending
+            self._rx_line += data
+        return len(data)
+
+    def drain(self, nbytes=None):
+        """Take up to nbytes (default: all) transmitted bytes (test hook)."""
+        with self._lock:
+            data = self._tx.read(nbytes)
+            self._tx_space.notify_all()
+        return data
+
+    def set_tx_flow(self, enabled):
+        """Make write wait for room in the TX capture (test hook).
+
+        While enabled no transmitted byte is dropped: ``write`` blocks
+        (in real time, the simulated clock does not move) until another
+        thread drained enough bytes, e.g. a bridge to a slow host.
+        """
+        with self._lock:
+            self._tx_flow = enabled
+            self._tx_space.notify_all()
+
+    def tx_pending(self):
+        """Return the number of transmitted bytes not drained yet."""
+        return len(self._tx)
+
+    def pending(self):
+        """Return the number of fed bytes which did not arrive yet."""
+        return len(self._rx_line) - self._rx_line_pos
+
+    def _arrived(self, now):
+        """Return the number of pending bytes which arrived by now."""
+        elapsed = now - self._rx_line_start
+        arrived = elapsed * self.baudrate // (self._frame_bits * 1000000)
+        return arrived - self._rx_line_done
+
+    def _receive(self):
+        """Move the bytes which arrived by now into the RX buffer."""
+        if self._rx_line_pos == len(self._rx_line):
+            return
+
+        with self._lock:
+            self._receive_arrived()
+
+    def _receive_arrived(self):
+        pending = len(self._rx_line) - self._rx_line_pos
+        arrived = min(self._arrived(self._board.clock.micros()), pending)
+        if arrived <= 0:
+            return
+
+        position = self._rx_line_pos
+        with memoryview(self._rx_line) as line:
+            written = self._rx.write(line[position:position + arrived])
+        self.overruns += arrived - written
+
+        position += arrived
+        self._rx_line_done += arrived
+        if position == len(self._rx_line):
+            self._rx_line.clear()
+            position = 0
+        elif position >= 65536:
+            del self._rx_line[:position]
+            position = 0
+        self._rx_line_pos = position
+
+    def _arrival(self, nbytes):
+        """Return the time at which nbytes are in the RX buffer, or None."""
+        missing = nbytes - len(self._rx)
+        if missing <= 0:
+            return self._board.clock.micros()
+        if missing > min(self.pending(), self._rx.free()):
+            return None
+        with self._lock:
+            bits = (self._rx_line_done + missing) * self._frame_bits * 1000000
+            return self._rx_line_start - (-bits // self.baudrate)
+
+    def _wait(self, nbytes, timeout):
+        """Wait until nbytes are buffered, at most timeout milliseconds.
+
+        nbytes may be a callable returning the number of bytes wanted.
+        It is asked again whenever scheduled clock events (e.g. a
+        stimulus) ran while waiting, since they may have fed bytes.
+        """
+        wanted = nbytes() if callable(nbytes) else nbytes
+        self._receive()
+        if len(self._rx) >= wanted:
+            return
+
+        clock = self._board.clock
+        now = clock.micros()
+        deadline = now + int(timeout * 1000)
+        while True:
+            until = deadline
+            arrival = self._arrival(wanted)
+            if arrival is not None and arrival < until:
+                until = arrival
+            due = clock.next_due()
+            if due is not None and due < until:
+                until = due
+            clock.advance(max(until - now, 0))
+            self._receive()
+
+            now = clock.micros()
+            if callable(nbytes):
+                wanted = nbytes()
+            if len(self._rx) >= wanted or now >= deadline:
+                return
+
+    def _timeout_for(self, nbytes):
+        """Return the time in ms the read of nbytes may wait."""
+        char_ms = self._char_us / 1000
+        return self.timeout + max(self.timeout_char, char_ms) * (nbytes - 1)
+
     def any(self):
         """Returns the number of bytes waiting (may be 0)."""
-        return randint(0, 10)
+        self._receive()
+        return len(self._rx)
 
     def read(self, nbytes=None):
         """Read characters.
@@ -1210,23 +3680,87 @@ class UART:
         Return value: a bytes object containing the bytes read in.
         Returns None on timeout."""
 
-        if nbytes:
-            number_of_bytes = nbytes
+        if nbytes is None:
+            self._wait(self._rx.capacity() + 1, self.timeout)
         else:
-            number_of_bytes = 5
+            self._wait(nbytes, self._timeout_for(nbytes))
 
-        self._read_buf = bytes(number_of_bytes)
+        if not len(self._rx):
+            return None
 
+        self._read_buf = self._rx.read(nbytes)
         return self._read_buf
 
     def readchar(self):
-        raise NotImplementedError()
+        """Receive a single character on the bus.
 
-    def readinto(self):
-        raise NotImplementedError()
+        Returns
+        -------
+        out: int
+            The character read, or -1 on timeout.
+        """
+        self._wait(1, self.timeout)
+        if not len(self._rx):
+            return -1
+        return self._rx.read(1)[0]
+
+    def readinto(self, buf, nbytes=None):
+        """Read bytes into the buf.
+
+        If nbytes is specified then read at most that many bytes.
+        Otherwise, read at most len(buf) bytes.
+
+        Returns
+        -------
+        out: int
+            Number of bytes read and stored into buf, or None on timeout.
+        """
+        wanted = len(memoryview(buf).cast('B'))
+        if nbytes is not None:
+            wanted = min(wanted, nbytes)
+        self._wait(wanted, self._timeout_for(wanted))
+
+        if not len(self._rx):
+            return None
+        return self._rx.readinto(buf, wanted)
+
+    def _newline_bytes(self):
+        """Return the number of bytes up to the next newline (on the RX
+        line), or more than fit in the buffer if none was fed yet."""
+        index = self._rx.find(b'\n')
+        if index >= 0:
+            return index + 1
+        newline = self._rx_line.find(b'\n', self._rx_line_pos)
+        if newline < 0:
+            return self._rx.capacity() + 1
+        return len(self._rx) + newline - self._rx_line_pos + 1
 
     def readline(self):
-        raise NotImplementedError()
+        """Read a line, ending in a newline character.
+
+        It may return sooner if a timeout is reached.
+
+        Returns
+        -------
+        out: bytes
+            The line read, or None on timeout.
+        """
+        self._receive()
+        index = self._rx.find(b'\n')
+        if index < 0:
+            # Wait for the newline, at the latest until the timeout.
+            nbytes = self._newline_bytes()
+            if nbytes <= self._rx.capacity():
+                self._wait(self._newline_bytes, self._timeout_for(nbytes))
+            else:
+                self._wait(self._newline_bytes, self.timeout)
+            index = self._rx.find(b'\n')
+
+        if not len(self._rx):
+            return None
+        if index < 0:
+            return self._rx.read()
+        return self._rx.read(index + 1)
 
     def write(self, buf):
         """Write the buffer of bytes to the bus.
@@ -1244,16 +3778,21 @@ class UART:
         -------
         out : int
             number of bytes written.
-            If a timeout occurs and no bytes were written returns
         """
-
-        # Todo: implement a timeout condition.
-        timeout = False
-
-        while not timeout:
-            self._written_buf = buf
-            out = len(self._written_buf)
-            return out
+        if isinstance(buf, str):
+            buf = buf.encode()
+
+        self._written_buf = buf
+        data = memoryview(buf).cast('B')
+        out = len(data)
+        with self._lock:
+            while self._tx_flow and len(data) > self._tx.free():
+                data = data[self._tx.write(data):]
+                self._tx_space.wait()
+            self.tx_dropped += self._tx.push(data)
+
+        self._board.clock.advance(round(out * self._char_us))
+        return out
 
     def writechar(self, char):
         """Write a single character on the bus.
@@ -1267,7 +3806,7 @@ class UART:
         out: None.
             See note below if CTS flow control is used.
         """
-        self._written_buf += char
+        self.write(bytes([char]))
 
     def sendbreak(self):
         raise NotImplementedError()
@@ -1279,50 +3818,222 @@ class USB_VCP:
         raise NotImplementedError()
 
 
+# ======================================================================
+# ============================= Profiling ==============================
+# ======================================================================
+
+class Profiler:
+    """Counts the calls and host time of the peripheral methods.
+
+    Profiling is opt-in: ``enable`` replaces the public methods of the
+    peripheral classes (and the time related functions) by counting
+    wrappers, ``disable`` puts the original methods back, so a disabled
+    profiler costs nothing.
+
+    For every method the number of calls, the time spent in the method
+    itself (``tottime``) and the time including the profiled methods it
+    called (``cumtime``) are accumulated, per caller as well, such that
+    the statistics can be exported in the ``pstats`` format.
+
+    Module functions are replaced in this module, so ``pyb.delay`` is
+    only profiled when ``pyb`` is this module (as with the runner).
+    """
+
+    CLASSES = ('Pin', 'ExtInt', 'Accel', 'LCD', 'LED', 'Switch', 'ADC',
+               'DAC', 'I2C', 'SPI', 'Timer', 'TimerChannel', 'UART')
+    FUNCTIONS = ('delay', 'udelay', 'millis', 'micros', 'elapsed_millis',
+                 'elapsed_micros', 'wfi', 'hard_reset')
+
+    def __init__(self):
+        self._originals = []
+        self._stats = {}
+        self._local = threading.local()
+
+    def enabled(self):
+        return bool(self._originals)
+
+    def enable(self):
+        """Start counting."""
+        if self._originals:
+            return
+
+        namespace = globals()
+        for class_name in self.CLASSES:
+            cls = namespace[class_name]
+            for name, member in list(vars(cls).items()):
+                if name.startswith('_') and name != '__call__':
+                    continue
+                key = '{}.{}'.format(class_name, name)
+                if isinstance(member, property):
+                    wrapped = property(self._wrap(key, member.fget),
+                                       member.fset, member.fdel,
+                                       member.__doc__)
+                elif hasattr(member, '__code__'):
+                    wrapped = self._wrap(key, member)
+                else:
+                    continue
+                self._originals.append((cls, name, member))
+                setattr(cls, name, wrapped)
+
+        module = sys.modules[__name__]
+        for name in self.FUNCTIONS:
+            function = namespace[name]
+            self._originals.append((module, name, function))
+            setattr(module, name, self._wrap(name, function))
+
+    def disable(self):
+        """Stop counting and restore the original methods."""
+        while self._originals:
+            owner, name, original = self._originals.pop()
+            setattr(owner, name, original)
+
+    def reset(self):
+        """Clear the statistics."""
+        self._stats = {}
+
+    def _wrap(self, key, function):
+        code = function.__code__
+        label = (code.co_filename, code.co_firstlineno, key)
+        local = self._local
+
+        def wrapper(*args, **kwargs):
+            stack = getattr(local, 'stack', None)
+            if stack is None:
+                stack = local.stack = []
+            caller = stack[-1][0] if stack else None
+            frame = [label, 0.0]
+            stack.append(frame)
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                stack.pop()
+                if stack:
+                    stack[-1][1] += elapsed
+                own = elapsed - frame[1]
+
+                entry = self._stats.get(label)
+                if entry is None:
+                    entry = self._stats[label] = [0, 0.0, 0.0, {}]
+                entry[0] += 1
+                entry[1] += own
+                entry[2] += elapsed
+                if caller is not None:
+                    edge = entry[3].get(caller)
+                    if edge is None:
+                        edge = entry[3][caller] = [0, 0.0, 0.0]
+                    edge[0] += 1
+                    edge[1] += own
+                    edge[2] += elapsed
+
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        wrapper.__wrapped__ = function
+        return wrapper
+
+    def stats(self):
+        """Return the statistics, sorted by cumulative time.
+
+        Returns
+        -------
+        out: list
+            Dicts with the name, calls, tottime and cumtime of each
+            profiled method.
+        """
+        rows = [
+            {'name': label[2], 'calls': entry[0], 'tottime': entry[1],
+             'cumtime': entry[2]}
+            for label, entry in self._stats.items()
+        ]
+        rows.sort(key=lambda row: row['cumtime'], reverse=True)
+        return rows
+
+    def report(self, file=None):
+        """Print the statistics as a table."""
+        file = sys.stdout if file is None else file
+        file.write('{:>10} {:>12} {:>12}  {}\n'.format(
+            'calls', 'tottime [s]', 'cumtime [s]', 'method'))
+        for row in self.stats():
+            file.write('{calls:10d} {tottime:12.6f} {cumtime:12.6f}  '
+                       '{name}\n'.format(**row))
+
+    def to_json(self, path_or_file):
+        """Export the statistics as JSON."""
+        import json
+        if isinstance(path_or_file, str):
+            with open(path_or_file, 'w') as file:
+                json.dump(self.stats(), file, indent=1)
+        else:
+            json.dump(self.stats(), path_or_file, indent=1)
+
+    def dump_stats(self, path):
+        """Export the statistics in the format of ``pstats``.
+
+        The file can be loaded with ``pstats.Stats(path)`` and viewers
+        such as snakeviz.
+        """
+        import marshal
+        data = {}
+        for label, (calls, tottime, cumtime, callers) in self._stats.items():
+            data[label] = (calls, calls, tottime, cumtime, {
+                caller: (edge[0], edge[0], edge[1], edge[2])
+                for caller, edge in callers.items()
+            })
+        with open(path, 'wb') as file:
+            marshal.dump(data, file)
+
+
+profiler = Profiler()
+
+
 #
 # Time related functions
 #
 
 def delay(milliseconds):
-    sys.stderr.write("PYB: delay %s\n" % milliseconds)
-    sleep(milliseconds / 1000)
+    """Delay for the given number of milliseconds of simulated time."""
+    board = current_board()
+    board.events.record("PYB", None, "delay", milliseconds)
+    board.clock.advance(milliseconds * 1000)
 
 
 def udelay(us):
-    sys.stderr.write("PYB: udelay %s\n" % us)
-    sleep(us / 1000000)
+    """Delay for the given number of microseconds of simulated time."""
+    board = current_board()
+    board.events.record("PYB", None, "udelay", us)
+    board.clock.advance(us)
 
 
-# def millis():
-#     sys.stderr.write("PYB: millis\n")
-#     result = micros() / 1000
-#     return result
+def millis():
+    """Returns the number of milliseconds since the board was last reset."""
+    return current_board().clock.micros() // 1000
 
 
-# def micros():
-#     sys.stderr.write("PYB: micros\n")
-#     delta = datetime.now() - _board.boot_time
-#     result = delta.total_seconds() * 1000000
-#     return result
+def micros():
+    """Returns the number of microseconds since the board was last reset."""
+    return current_board().clock.micros()
 
 
-# def elapsed_millis(start):
-#     sys.stderr.write("PYB: elapsed_millis\n")
-#     result = elapsed_micros(start) / 1000
-#     return result
+def elapsed_millis(start):
+    """Returns the number of milliseconds which have elapsed since
+    ``start``.
+    """
+    return millis() - start
 
 
-# def elapsed_micros(start):
-#     sys.stderr.write("PYB: elapsed_micros\n")
-#     result = micros() - start
-#     return result
+def elapsed_micros(start):
+    """Returns the number of microseconds which have elapsed since
+    ``start``.
+    """
+    return micros() - start
 
 
-# def hard_reset():
-#     """Resets the pyboard in a manner similar to pushing the external
-#     RESET button.
-#     """
-#     _board.boot()
+def hard_reset():
+    """Resets the pyboard in a manner similar to pushing the external
+    RESET button.
+    """
+    current_board().reset()
 
 
 def bootloader():
@@ -1335,8 +4046,11 @@ def disable_irq():
     Returns the previous IRQ state: ``False``/``True`` for
     disabled/enabled IRQs respectively.  This return value can be
     passed to enable_irq to restore the IRQ to its original state.
+
+    Interrupts raised while IRQs are disabled are queued and run when
+    they are enabled again.
     """
-    raise NotImplementedError()
+    return current_board().disable_irq()
 
 
 def enable_irq(state=True):
@@ -1346,7 +4060,7 @@ def enable_irq(state=True):
     most common use of this function is to pass it the value returned
     by ``disable_irq`` to exit a critical section.
     """
-    raise NotImplementedError()
+    current_board().enable_irq(state)
 
 
 def freq(sysclk=None, hclk=None, pclk1=None, pclk2=None):
@@ -1401,8 +4115,16 @@ def wfi():
     or external), at which point execution continues.  Note that the
     system-tick interrupt occurs once every millisecond (1000Hz) so
     this function will block for at most 1ms.
+
+    The simulated clock advances to the next scheduled event, by 1 ms
+    at most.
     """
-    raise NotImplementedError()
+    clock = current_board().clock
+    now = clock.micros()
+    due = clock.next_due()
+    if due is None or due > now + 1000:
+        due = now + 1000
+    clock.advance(max(due - now, 0))
 
 
 def stop():
@@ -1452,8 +4174,17 @@ def hid(buttons, x, y, z):
 
 
 def info(dump_alloc_table=None):
-    """Print out lots of information about the board."""
-    raise NotImplementedError()
+    """Print out lots of information about the board.
+
+    Prints the simulated time, the peripherals and, when profiling was
+    enabled (see ``profiler``), the calls and host time per method.
+    """
+    board = current_board()
+    sys.stdout.write('simulated time: {} us\n'.format(board.clock.micros()))
+    sys.stdout.write('peripherals: {}\n'.format(', '.join(
+        type(peripheral).__name__ for peripheral in board.peripherals)))
+    if profiler.stats():
+        profiler.report()
 
 
 def main(filename):
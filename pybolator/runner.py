@@ -0,0 +1,252 @@
+"""Headless runner for firmware scripts.
+
+Description:
+    Installs the emulator as the ``pyb`` module, together with minimal
+    ``machine`` and ``utime`` modules acting on the same board, and runs
+    a firmware script as ``__main__``, optionally replaying a stimulus
+    file and recording a trace.
+
+Usage:
+    python -m pybolator [options] script.py [args ...]
+
+    python -m pybolator --seed 3 --stimulus session.txt.gz \\
+        --trace trace --vcd trace.vcd main.py
+
+"""
+
+# ======================================================================
+# ========================= Import Statements ==========================
+# ======================================================================
+
+# # Built-in Imports:
+import argparse
+import os
+import runpy
+import sys
+import time as host_time
+import traceback
+import types
+
+# # Package Imports:
+from . import pyboard
+
+# ======================================================================
+# ============================= Functions ==============================
+# ======================================================================
+
+
+def machine_module():
+    """Return a ``machine`` module backed by the emulator."""
+    module = types.ModuleType('machine')
+    for name in ('ADC', 'I2C', 'Pin', 'SPI', 'Timer', 'UART',
+                 'disable_irq', 'enable_irq', 'freq', 'unique_id'):
+        setattr(module, name, getattr(pyboard, name))
+    module.reset = pyboard.hard_reset
+    module.soft_reset = pyboard.hard_reset
+    module.idle = pyboard.wfi
+    return module
+
+
+def utime_module():
+    """Return a ``utime`` module reading the simulated clock."""
+    module = types.ModuleType('utime')
+
+    def sleep(seconds):
+        pyboard.udelay(int(seconds * 1000000))
+
+    def time():
+        return pyboard.micros() // 1000000
+
+    def ticks_diff(ticks1, ticks2):
+        return ticks1 - ticks2
+
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    module.sleep = sleep
+    module.sleep_ms = pyboard.delay
+    module.sleep_us = pyboard.udelay
+    module.ticks_ms = pyboard.millis
+    module.ticks_us = pyboard.micros
+    module.ticks_cpu = pyboard.micros
+    module.ticks_diff = ticks_diff
+    module.ticks_add = ticks_add
+    module.time = time
+    return module
+
+
+def time_module():
+    """Return a ``time`` module for the script.
+
+    On MicroPython ``time`` is ``utime``: the sleeps and ticks act on the
+    simulated clock. The other attributes of the host ``time`` module are
+    kept, for the host modules the script may import.
+    """
+    module = types.ModuleType('time')
+    module.__dict__.update(
+        (name, value) for name, value in vars(host_time).items()
+        if not name.startswith('__'))
+    utime = utime_module()
+    for name in ('sleep', 'sleep_ms', 'sleep_us', 'ticks_ms', 'ticks_us',
+                 'ticks_cpu', 'ticks_diff', 'ticks_add'):
+        setattr(module, name, getattr(utime, name))
+    return module
+
+
+def install():
+    """Install the ``pyb``, ``machine`` and ``utime`` modules.
+
+    The ``time`` module is only replaced while a script runs.
+    """
+    sys.modules['pyb'] = pyboard
+    sys.modules['machine'] = machine_module()
+    sys.modules['utime'] = utime_module()
+
+
+def run(script, args=(), clock='instant', seed=0, stimulus=None,
+        trace=None, vcd=None, time_limit=None, board=None, profile=None,
+        dashboard=None):
+    """Run a firmware script on a new board.
+
+    Parameters
+    ----------
+    script: str
+        Path of the script.
+    args: sequence
+        Arguments passed to the script in sys.argv.
+    clock: str
+        'instant' or 'realtime'.
+    seed: int
+        Seed of the board signal sources.
+    stimulus: str, optional
+        Stimulus file replayed from boot.
+    trace: str, optional
+        Directory the trace is recorded to.
+    vcd: str, optional
+        VCD file the trace is exported to. Requires trace.
+    time_limit: float, optional
+        Seconds of simulated time after which the script is stopped
+        with pyboard.TimeLimitExceeded.
+    board: Board, optional
+        Board to run on instead of a new one (clock and seed are then
+        ignored).
+    profile: str, optional
+        Profile the peripheral methods and write the statistics to this
+        file: JSON if it ends in .json, pstats data otherwise.
+    dashboard: float, optional
+        Show the live dashboard, redrawn at most this many times per
+        second (only when stdout is a terminal).
+
+    Returns
+    -------
+    out: Board
+        The board the script ran on.
+    """
+    install()
+
+    if board is None:
+        mode = pyboard.Clock.REALTIME if clock == 'realtime' else \
+            pyboard.Clock.INSTANT
+        board = pyboard.Board(clock_mode=mode, seed=seed)
+    board.activate()
+    if time_limit is not None:
+        board.clock.limit_us = (board.clock.micros()
+                                + int(time_limit * 1000000))
+
+    tracer = None
+    if trace is not None:
+        from .tracing import Tracer
+        tracer = Tracer(trace, board)
+    replay = None
+    if stimulus is not None:
+        from .stimulus import Stimulus
+        replay = Stimulus(stimulus, board)
+        replay.start()
+    view = None
+    if dashboard is not None:
+        from .dashboard import Dashboard
+        view = Dashboard(board, fps=dashboard)
+        view.start()
+
+    argv = sys.argv
+    sys.argv = [script] + list(args)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    sys.modules['time'] = time_module()
+    if profile is not None:
+        pyboard.profiler.reset()
+        pyboard.profiler.enable()
+    try:
+        runpy.run_path(script, run_name='__main__')
+    finally:
+        if view is not None:
+            view.stop()
+        if profile is not None:
+            pyboard.profiler.disable()
+            if profile.endswith('.json'):
+                pyboard.profiler.to_json(profile)
+            else:
+                pyboard.profiler.dump_stats(profile)
+        sys.modules['time'] = host_time
+        del sys.path[0]
+        sys.argv = argv
+        if replay is not None:
+            replay.stop()
+        if tracer is not None:
+            tracer.close()
+            if vcd is not None:
+                from .tracing import TraceReader
+                with TraceReader(trace) as reader:
+                    reader.to_vcd(vcd)
+        board.deactivate()
+    return board
+
+
+def main(argv=None):
+    """Command line entry point, returns the exit status."""
+    parser = argparse.ArgumentParser(
+        prog='python -m pybolator',
+        description='Run a pyboard firmware script on the emulator.')
+    parser.add_argument('script', help='firmware script to run')
+    parser.add_argument('args', nargs=argparse.REMAINDER,
+                        help='arguments passed to the script')
+    parser.add_argument('--clock', choices=('instant', 'realtime'),
+                        default='instant',
+                        help='run as fast as possible (default) or pace '
+                             'the simulated clock to the wall clock')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the simulated inputs (default: 0)')
+    parser.add_argument('--stimulus', metavar='FILE',
+                        help='stimulus file to replay')
+    parser.add_argument('--trace', metavar='DIR',
+                        help='record the outputs into this directory')
+    parser.add_argument('--vcd', metavar='FILE',
+                        help='export the trace as a VCD file')
+    parser.add_argument('--time-limit', metavar='SECONDS', type=float,
+                        help='stop the script after this much simulated '
+                             'time')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='count calls and host time of the peripheral '
+                             'methods; write JSON (.json) or pstats data')
+    parser.add_argument('--dashboard', action='store_true',
+                        help='show the LEDs, LCD and pins live in the '
+                             'terminal')
+    parser.add_argument('--fps', type=float, default=10.0,
+                        help='maximum redraws per second of the dashboard '
+                             '(default: 10)')
+    options = parser.parse_args(argv)
+
+    if options.vcd is not None and options.trace is None:
+        parser.error('--vcd requires --trace')
+
+    try:
+        run(options.script, options.args, clock=options.clock,
+            seed=options.seed, stimulus=options.stimulus,
+            trace=options.trace, vcd=options.vcd,
+            time_limit=options.time_limit, profile=options.profile,
+            dashboard=options.fps if options.dashboard else None)
+    except KeyboardInterrupt:
+        return 130
+    except (Exception, pyboard.TimeLimitExceeded):
+        traceback.print_exc()
+        return 1
+    return 0
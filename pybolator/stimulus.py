@@ -0,0 +1,177 @@
+"""Stimulus timelines replayed against the simulated clock.
+
+Description:
+    A stimulus file is a recorded input session: switch presses,
+    accelerometer and ADC values, pin levels and bytes on UART lines.
+    It is read lazily while the simulated clock advances, only the next
+    event is scheduled on the clock at any time, so captures of any size
+    are replayed in constant memory.
+
+File format:
+    One event per line, ``<time_us> <target> <value>``, with times in
+    microseconds relative to the start of the replay, in ascending
+    order. Blank lines and ``#`` comments are skipped. Files ending in
+    ``.gz`` are decompressed on the fly.
+
+        # time_us  target    value
+        0          accel.x   12
+        1000       adc.X2    2048
+        1500       pin.X1    1
+        20000      switch    press
+        70000      switch    release
+        80000      uart.1    48656c6c6f0a
+
+    Targets:
+        switch          press/release (or 1/0) the switch.
+        pin.<name>      drive the pin to 0 or 1.
+        uart.<bus>      feed the hex encoded bytes to the RX line of the
+                        UART(s) on that bus. Bytes for a bus without a
+                        UART are lost, as on a line without a receiver.
+        anything else   hold the integer value on the signal channel of
+                        that name, e.g. accel.x, adc.X2 or spi1.
+
+Usage:
+    stimulus = Stimulus('session.txt.gz')
+    stimulus.start()
+    # run the firmware script
+
+"""
+
+# ======================================================================
+# ========================= Import Statements ==========================
+# ======================================================================
+
+# # Built-in Imports:
+import gzip
+
+# # Package Imports:
+from .pyboard import Constant, Switch, UART, current_board
+
+# ======================================================================
+# ============================== Classes ===============================
+# ======================================================================
+
+
+class Stimulus:
+    """Replays a stimulus file on a board."""
+
+    def __init__(self, source, board=None):
+        """
+
+        Parameters
+        ----------
+        source: str or iterable
+            Path of the stimulus file, or an iterable of its lines (e.g.
+            an open text file).
+        board: Board, optional
+            Defaults to the current board.
+        """
+        self.source = source
+        self.board = board if board is not None else current_board()
+
+        self._events = None
+        self._next = None
+        self._pending = None
+        self._origin = 0
+        self._held = {}
+
+    def events(self):
+        """Generate the (time_us, target, value) events of the source."""
+        source = self.source
+        if isinstance(source, str):
+            if source.endswith('.gz'):
+                stream = gzip.open(source, 'rt')
+            else:
+                stream = open(source)
+            with stream:
+                yield from self._parse(stream)
+        else:
+            yield from self._parse(source)
+
+    def _parse(self, lines):
+        last = 0
+        for number, line in enumerate(lines, 1):
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) != 3:
+                raise ValueError(
+                    "Line {}: expected '<time_us> <target> <value>', got "
+                    "{!r}.".format(number, line.rstrip()))
+            time_us = int(fields[0])
+            if time_us < last:
+                raise ValueError(
+                    "Line {}: time {} us is before the previous event."
+                    .format(number, time_us))
+            last = time_us
+            yield time_us, fields[1], fields[2]
+
+    def start(self):
+        """Start the replay at the current simulated time."""
+        self.stop()
+        self._origin = self.board.clock.micros()
+        self._events = self.events()
+        self._next = next(self._events, None)
+        self._fire()
+
+    def stop(self):
+        """Stop the replay."""
+        if self._pending is not None:
+            self.board.clock.cancel(self._pending)
+            self._pending = None
+        if self._events is not None:
+            self._events.close()
+            self._events = None
+        self._next = None
+
+    def done(self):
+        """Return True when all events have been applied."""
+        return self._next is None
+
+    def _schedule(self):
+        if self._next is None:
+            self._pending = None
+            if self._events is not None:
+                self._events.close()
+                self._events = None
+            return
+        self._pending = self.board.clock.schedule(
+            self._origin + self._next[0], self._fire)
+
+    def _fire(self):
+        # Apply all events which are due, then schedule the next one.
+        due = self.board.clock.micros() - self._origin
+        event = self._next
+        while event is not None and event[0] <= due:
+            self.apply(event[1], event[2])
+            event = next(self._events, None)
+        self._next = event
+        self._schedule()
+
+    def apply(self, target, value):
+        """Apply one event to the board."""
+        board = self.board
+        if target == 'switch':
+            # Presses before the script created the switch are lost
+            switch = board.fixed.get((Switch, None))
+            if switch is not None:
+                if value in ('press', '1'):
+                    switch.press()
+                else:
+                    switch.release()
+        elif target.startswith('pin.'):
+            board.set_pin(target[4:], int(value))
+        elif target.startswith('uart.'):
+            bus = int(target[5:])
+            data = bytes.fromhex(value)
+            for peripheral in board.peripherals:
+                if isinstance(peripheral, UART) and peripheral.bus == bus:
+                    peripheral.feed(data)
+        else:
+            # Reuse the held value source, unless the test attached
+            # another source to the channel meanwhile.
+            held = self._held.get(target)
+            if held is not None and board.signals.get(target) is held:
+                held.value = int(value)
+            else:
+                self._held[target] = board.signal(target, Constant(int(value)))
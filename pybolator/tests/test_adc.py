@@ -0,0 +1,56 @@
+import pyb
+import array
+
+# This code can be run on your pyboard without modifications
+
+#######
+# ADC #
+#######
+
+adc = pyb.ADC('X1')
+
+# read
+value = adc.read()
+assert 0 <= value <= 4095
+
+# read_timed, 12-bit samples
+tim = pyb.Timer(6, freq=10000)
+buf = array.array('H', [0] * 100)
+start = pyb.millis()
+adc.read_timed(buf, tim)
+assert pyb.elapsed_millis(start) >= 10
+assert max(buf) <= 4095
+
+# read_timed, 8-bit samples
+buf = bytearray(100)
+adc.read_timed(buf, tim)
+
+# read_timed, at a frequency the timer clock does not divide evenly
+odd = pyb.Timer(7, freq=44100)
+buf = array.array('H', [0] * 441)
+start = pyb.millis()
+adc.read_timed(buf, odd)
+assert pyb.elapsed_millis(start) >= 9
+assert max(buf) <= 4095
+
+# ---------------------------------------------------------------------
+# Stimulus replay (emulator only)
+# ---------------------------------------------------------------------
+try:
+    from pybolator.stimulus import Stimulus
+except ImportError:
+    raise SystemExit  # on a pyboard
+
+# Both read paths follow a value change replayed on the same channel
+stimulus = Stimulus(['0 adc.X1 2048', '1000 adc.X1 100'])
+stimulus.start()
+assert adc.read() == 2048
+buf = array.array('H', [0] * 10)
+adc.read_timed(buf, tim)
+assert list(buf) == [2048] * 10
+
+pyb.delay(2)
+assert stimulus.done()
+assert adc.read() == 100
+adc.read_timed(buf, tim)
+assert list(buf) == [100] * 10
@@ -0,0 +1,69 @@
+import pyb
+import math
+
+# This code can be run on your pyboard without modifications
+
+#######
+# DAC #
+#######
+
+dac = pyb.DAC(1)
+
+# write
+dac.write(128)
+
+# noise and triangle
+dac.noise(500)
+pyb.delay(10)
+dac.triangle(2048)
+pyb.delay(10)
+
+# sine wave, 400Hz
+buf = bytearray(100)
+for i in range(len(buf)):
+    buf[i] = 128 + int(127 * math.sin(2 * math.pi * i / len(buf)))
+
+dac.write_timed(buf, 400 * len(buf), mode=pyb.DAC.CIRCULAR)
+pyb.delay(10)
+
+# triggered by a timer the clock does not divide evenly
+dac.write_timed(buf, pyb.Timer(6, freq=9973))
+pyb.delay(20)
+
+# ---------------------------------------------------------------------
+# Output trace (emulator only)
+# ---------------------------------------------------------------------
+try:
+    from pyb import current_board
+except ImportError:
+    raise SystemExit  # on a pyboard
+
+clock = current_board().clock
+
+# direct writes hold their value
+now = clock.micros()
+dac.write(10)
+pyb.delay(2)
+dac.write(20)
+pyb.delay(2)
+assert list(dac.output(now, now + 4000)) == [10, 10, 20, 20]
+assert len(dac.output(now, now)) == 0
+assert len(dac.output(now + 4000, now)) == 0
+
+# NORMAL bursts hold their last value
+now = clock.micros()
+dac.write_timed(bytearray([1, 2, 3]), 1000)
+pyb.delay(6)
+assert list(dac.output(now, now + 6000)) == [1, 2, 3, 3, 3, 3]
+
+# CIRCULAR bursts wrap around
+now = clock.micros()
+dac.write_timed(bytearray([1, 2, 3]), 1000, mode=pyb.DAC.CIRCULAR)
+pyb.delay(7)
+assert list(dac.output(now, now + 7000)) == [1, 2, 3, 1, 2, 3, 1]
+
+# bursts timed by a timer follow its exact frequency
+now = clock.micros()
+dac.write_timed(bytearray([1, 2, 3]), pyb.Timer(6, freq=9973))
+pyb.delay(1)
+assert list(dac.output(now, now + 1000))[:4] == [1, 2, 3, 3]
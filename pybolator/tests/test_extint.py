@@ -0,0 +1,43 @@
+import pyb
+
+# This code can be run on your pyboard without modifications
+
+##########
+# ExtInt #
+##########
+
+edges = []
+
+
+def callback(line):
+    edges.append(line)
+
+
+pin = pyb.Pin('X1', pyb.Pin.OUT_PP)
+pin.value(0)
+extint = pyb.ExtInt(pin, pyb.ExtInt.IRQ_RISING, pyb.Pin.PULL_NONE, callback)
+
+# rising edges only
+pin.value(1)
+pin.value(0)
+pin.value(1)
+assert edges == [extint.line(), extint.line()]
+
+# disabled interrupt
+extint.disable()
+pin.value(0)
+pin.value(1)
+assert len(edges) == 2
+extint.enable()
+
+# software interrupt
+extint.swint()
+assert len(edges) == 3
+
+# interrupts are held back in critical sections
+state = pyb.disable_irq()
+pin.value(0)
+pin.value(1)
+assert len(edges) == 3
+pyb.enable_irq(state)
+assert len(edges) == 4
@@ -0,0 +1,82 @@
+import pyb
+
+# This code can be run on your pyboard without modifications
+
+#######
+# I2C #
+#######
+
+i2c = pyb.I2C(1, pyb.I2C.MASTER, baudrate=400000)
+
+# scan, nothing connected
+assert i2c.scan() == []
+assert not i2c.is_ready(0x50)
+
+try:
+    i2c.mem_read(1, 0x50, 0)
+except OSError:
+    pass
+else:
+    raise AssertionError('Reading from a missing device must fail.')
+
+# one object per bus, constructing it again initialises it again
+assert pyb.I2C(1, pyb.I2C.MASTER, baudrate=100000) is i2c
+
+# ---------------------------------------------------------------------
+# Device models (emulator only)
+# ---------------------------------------------------------------------
+try:
+    from pyb import EEPROM, RegisterMap
+except ImportError:
+    raise SystemExit  # on a pyboard
+
+# sensor register map, 8-bit register addresses
+sensor = RegisterMap({0x0F: 0x33, 0x20: 0x07})
+i2c.attach(0x19, sensor)
+assert i2c.scan() == [0x19]
+assert pyb.I2C(1).scan() == [0x19]
+assert i2c.is_ready(0x19)
+assert i2c.mem_read(1, 0x19, 0x0F) == b'\x33'
+i2c.mem_write(0x47, 0x19, 0x20)
+assert sensor[0x20] == 0x47
+
+# send sets the register pointer, recv continues from it
+i2c.send(bytearray([0x0F]), 0x19)
+assert i2c.recv(2, 0x19) == b'\x33\x00'
+i2c.send(bytearray([0x30, 1, 2]), 0x19)
+assert sensor[0x30] == 1 and sensor[0x31] == 2
+assert i2c.recv(1, 0x19) == b'\x00'
+assert sensor.pointer == 0x33
+
+# the pointer wraps at the end of the memory
+i2c.mem_write(b'\xaa\xbb', 0x19, 0xFF)
+assert sensor[0xFF] == 0xaa and sensor[0x00] == 0xbb
+assert sensor.pointer == 1
+assert i2c.mem_read(3, 0x19, 0xFF) == b'\xaa\xbb\x00'
+
+# EEPROM, 16-bit memory addresses, erased cells read 0xFF
+eeprom = EEPROM(size=4096)
+i2c.attach(0x50, eeprom)
+assert i2c.scan() == [0x19, 0x50]
+assert i2c.mem_read(4, 0x50, 0x0123, addr_size=16) == b'\xff' * 4
+i2c.mem_write(b'hello', 0x50, 0x0123, addr_size=16)
+buf = bytearray(5)
+assert i2c.mem_read(buf, 0x50, 0x0123, addr_size=16) is buf
+assert buf == b'hello'
+
+# plain writes carry the two address bytes first
+i2c.send(bytearray([0x0F, 0xFE, ord('x'), ord('y'), ord('z')]), 0x50)
+assert eeprom.memory[0xFFE:] == b'xy'
+assert eeprom.memory[0] == ord('z')
+i2c.send(bytearray([0x01, 0x23]), 0x50)
+assert i2c.recv(5, 0x50) == b'hello'
+
+# detached devices stop answering
+i2c.detach(0x50)
+assert i2c.scan() == [0x19]
+try:
+    i2c.recv(1, 0x50)
+except OSError:
+    pass
+else:
+    raise AssertionError('Reading from a detached device must fail.')
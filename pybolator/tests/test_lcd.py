@@ -43,3 +43,55 @@ lcd.contrast(0)
 lcd.contrast(47)
 
 # lcd.command(self, instr_data, buf)
+
+# ---------------------------------------------------------------------
+# Frame capture and golden images (emulator only)
+# ---------------------------------------------------------------------
+try:
+    from pybolator.capture import FrameStore, assert_matches, load
+except ImportError:
+    raise SystemExit  # on a pyboard
+
+import os
+import shutil
+import tempfile
+
+lcd = pyb.LCD('X')
+store = FrameStore(lcd)
+lcd.fill(0)
+lcd.text('Hi', 0, 0, 1)
+lcd.show()
+lcd.show()                      # unchanged, not recorded
+lcd.pixel(127, 31, 1)
+lcd.show()
+assert len(store) == 2
+assert store.dropped == 1
+assert store.images() == 2
+first, last = store[0], store[1]
+assert first.pixel(127, 31) == 0
+assert last.pixel(127, 31) == 1
+assert first.time_us <= last.time_us
+
+directory = tempfile.mkdtemp()
+try:
+    # round trip through the image files
+    for extension in ('png', 'pbm'):
+        path = os.path.join(directory, 'screen.' + extension)
+        last.save(path)
+        assert load(path) == last
+    assert len(store.export(os.path.join(directory, 'frames'))) == 2
+
+    # a missing golden image is created, then frames are compared to it
+    golden = os.path.join(directory, 'golden', 'screen.png')
+    assert_matches(first, golden)
+    assert_matches(first, golden)
+    try:
+        assert_matches(last, golden)
+    except AssertionError as error:
+        assert '1 of 4096 pixels differ: (127, 31)' in str(error)
+    else:
+        raise AssertionError('A differing frame must not match.')
+    diff = load(os.path.join(directory, 'golden', 'screen.diff.png'))
+    assert diff.data == bytes(511) + b'\x01'
+finally:
+    shutil.rmtree(directory)
@@ -0,0 +1,97 @@
+import pyb
+
+# This code can be run on your pyboard without modifications
+
+#######
+# SPI #
+#######
+
+spi = pyb.SPI(1, pyb.SPI.MASTER, baudrate=600000, polarity=1, phase=0)
+
+# send
+spi.send(b'\x01\x02')
+spi.send(0x03)
+
+# recv
+data = spi.recv(5)
+assert len(data) == 5
+
+buf = bytearray(4)
+assert spi.recv(buf) is buf
+
+# send_recv
+data = spi.send_recv(b'1234')
+assert len(data) == 4
+
+buf = bytearray(b'1234')
+assert spi.send_recv(buf, buf) is buf
+
+# ---------------------------------------------------------------------
+# Device models (emulator only)
+# ---------------------------------------------------------------------
+try:
+    from pyb import DisplayController, ShiftRegister, SPIFlash
+except ImportError:
+    raise SystemExit  # on a pyboard
+
+# chain of two shift registers: bytes come back two bytes later
+spi.attach(ShiftRegister(2))
+assert spi.send_recv(b'\x01\x02\x03') == b'\x00\x00\x01'
+assert spi.send_recv(b'\x04') == b'\x02'
+assert spi.recv(2) == b'\x03\x04'
+
+# flash, one transaction while chip select is low
+cs = pyb.Pin('X5', pyb.Pin.OUT_PP)
+cs.value(1)
+flash = SPIFlash(size=64 * 1024)
+spi.attach(flash, cs=cs)
+
+
+def command(*parts, nbytes=0):
+    cs.value(0)
+    for part in parts:
+        spi.send(part)
+    data = spi.recv(nbytes) if nbytes else None
+    cs.value(1)
+    return data
+
+
+assert command(b'\x9f', nbytes=3) == SPIFlash.JEDEC_ID
+assert command(b'\x03\x00\x10\x00', nbytes=4) == b'\xff' * 4
+
+# programming needs a write enable, which it clears
+command(b'\x02\x00\x10\x00', b'data')
+assert command(b'\x03\x00\x10\x00', nbytes=4) == b'\xff' * 4
+command(b'\x06')
+assert command(b'\x05', nbytes=1) == b'\x02'
+command(b'\x02\x00\x10\x00', b'da', b'ta')
+assert command(b'\x05', nbytes=1) == b'\x00'
+assert command(b'\x03\x00\x10\x00', nbytes=4) == b'data'
+
+# page program wraps within its page
+command(b'\x06')
+command(b'\x02\x00\x20\xfe', b'wrap')
+assert flash.memory[0x20fe:0x2100] == b'wr'
+assert flash.memory[0x2000:0x2002] == b'ap'
+
+# the sector erase happens when chip select goes high
+command(b'\x06')
+cs.value(0)
+spi.send(b'\x20\x00\x10\x00')
+assert flash.memory[0x1000:0x1004] == b'data'
+cs.value(1)
+assert flash.memory[0x1000:0x1004] == b'\xff' * 4
+assert flash.memory[0x2000:0x2002] == b'ap'
+
+# display controller: the D/C pin splits commands from data
+dc = pyb.Pin('X4', pyb.Pin.OUT_PP)
+display = DisplayController(dc=dc)
+spi.attach(display)
+dc.value(0)
+spi.send(b'\xae\xa8')
+dc.value(1)
+spi.send(b'\x01\x02\x03')
+dc.value(0)
+spi.send(0xaf)
+assert display.commands == b'\xae\xa8\xaf'
+assert display.data == b'\x01\x02\x03'
@@ -22,3 +22,58 @@ def f():
     pyb.LED(1).toggle()
 
 sw.callback(f)
+
+# ---------------------------------------------------------------------
+# Simulated presses (emulator only)
+# ---------------------------------------------------------------------
+if not hasattr(sw, 'press'):
+    raise SystemExit  # on a pyboard
+
+presses = []
+sw.callback(lambda: presses.append(pyb.micros()))
+
+# the callback runs as an interrupt, right away
+sw.press()
+assert sw() == True
+assert len(presses) == 1
+sw.release()
+assert sw() == False
+
+# with IRQs disabled it is queued until they are enabled again
+state = pyb.disable_irq()
+sw.press()
+assert len(presses) == 1
+pyb.enable_irq(state)
+assert len(presses) == 2
+sw.release()
+
+# bounce within debounce_us is ignored...
+sw = pyb.Switch(debounce_us=5000)
+pyb.delay(10)
+sw.press()
+pyb.udelay(100)
+sw.release()
+pyb.udelay(100)
+sw.press()
+pyb.delay(10)
+assert sw() == True
+assert len(presses) == 3
+
+# ...but a release within debounce_us is applied once the switch settled
+sw.release()
+pyb.delay(10)
+assert sw() == False
+sw.press()
+pyb.udelay(1000)
+sw.release()
+pyb.delay(100)
+assert sw() == False
+assert len(presses) == 4
+
+# injected presses held 1 ms, 10 ms apart
+start = pyb.micros()
+sw.inject([start + 10000 * (i + 1) for i in range(10)], hold_us=1000)
+pyb.delay(200)
+assert len(presses) == 14
+assert presses[-1] == start + 100000
+assert sw() == False
@@ -0,0 +1,48 @@
+import pyb
+
+# This code can be run on your pyboard without modifications
+
+#########
+# Timer #
+#########
+
+tim = pyb.Timer(4, freq=1000)
+assert tim.freq() == 1000
+assert tim.source_freq() == (tim.prescaler() + 1) * (tim.period() + 1) * 1000
+
+# counter
+assert 0 <= tim.counter() <= tim.period()
+
+# callback
+ticks = [0]
+
+
+def tick(timer):
+    ticks[0] += 1
+
+
+tim.callback(tick)
+pyb.delay(100)
+tim.callback(None)
+assert 95 <= ticks[0] <= 105
+
+# frequency changes keep prescaler and period consistent
+tim.freq(10)
+assert tim.freq() == 10
+
+# period changes keep the counter (1 MHz count, 1500 us elapsed)
+tim.init(prescaler=83, period=999)
+pyb.udelay(1500)
+counter = tim.counter()
+tim.period(1999)
+assert 0 <= tim.counter() - counter <= 10
+
+# one timer per id: initialising it again disables the old callback
+ticks[0] = 0
+tim.init(freq=1000, callback=tick)
+assert pyb.Timer(4, freq=10) is tim
+pyb.delay(100)
+assert ticks[0] == 0
+assert pyb.Timer(4).freq() == 10
+
+tim.deinit()
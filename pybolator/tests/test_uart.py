@@ -0,0 +1,112 @@
+import pyb
+
+# This code can be run on your pyboard without modifications
+
+########
+# UART #
+########
+
+uart = pyb.UART(1, 9600, timeout=100)
+
+# write
+uart.write('hello')
+uart.writechar(ord('\n'))
+
+# read, nothing connected
+assert uart.any() == 0
+start = pyb.millis()
+assert uart.read(5) is None
+assert pyb.elapsed_millis(start) >= 100
+
+buf = bytearray(8)
+assert uart.readinto(buf) is None
+assert uart.readline() is None
+assert uart.readchar() == -1
+
+# long writes, nothing connected
+data = bytes(range(256)) * 8
+for i in range(10):
+    assert uart.write(data) == len(data)
+
+# ---------------------------------------------------------------------
+# RX line and TX capture (emulator only)
+# ---------------------------------------------------------------------
+if not hasattr(uart, 'feed'):
+    raise SystemExit  # on a pyboard
+
+# the capture keeps the last bytes written
+assert uart.tx_dropped > 0
+assert uart.drain()[-len(data):] == data
+assert uart.tx_pending() == 0
+
+# fed bytes arrive at the baudrate (about 1 ms per character at 9600)
+uart = pyb.UART(2, 9600, timeout=100, read_buf_len=16)
+uart.feed(b'line one\nline two\n')
+assert uart.any() == 0
+pyb.delay(2)
+assert uart.any() == 1
+assert uart.readline() == b'line one\n'
+assert uart.readline() == b'line two\n'
+assert uart.readline() is None
+
+uart.feed(b'abcdef')
+buf = bytearray(4)
+assert uart.readinto(buf) == 4
+assert buf == b'abcd'
+assert uart.readinto(buf, 1) == 1
+assert buf[:1] == b'e'
+assert uart.read() == b'f'
+
+# bytes arriving while the receive buffer is full are lost
+uart.feed(bytes(20))
+pyb.delay(30)
+assert uart.any() == 16
+assert uart.overruns == 4
+assert uart.read(16) == bytes(16)
+
+# ---------------------------------------------------------------------
+# Bridge to a host program (emulator only)
+# ---------------------------------------------------------------------
+import socket
+import threading
+
+from pybolator.bridge import BridgeLoop, UARTBridge
+
+uart = pyb.UART(3, 115200)
+loop = BridgeLoop()
+bridge = UARTBridge(uart)
+client = socket.create_connection(loop.run(bridge.serve_tcp()))
+received = bytearray()
+
+
+def receive():
+    while True:
+        data = client.recv(65536)
+        if not data:
+            return
+        received.extend(data)
+
+
+host = threading.Thread(target=receive)
+host.start()
+
+# wait (in host time) for the bridge to pick up the connection
+idle = threading.Event()
+client.sendall(b'!')
+while not uart.pending():
+    idle.wait(0.001)
+
+# writes wait for the bridge instead of dropping bytes
+data = bytes(range(250)) * 4
+for i in range(100):
+    assert uart.write(data) == len(data)
+while uart.tx_pending():
+    idle.wait(0.001)
+loop.run(bridge.close())
+host.join()
+client.close()
+loop.stop()
+
+assert len(received) == 100 * len(data) > uart.TX_BUF_LEN
+assert received == data * 100
+assert uart.tx_dropped == 0
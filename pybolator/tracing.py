@@ -0,0 +1,261 @@
+"""Binary trace of output state changes, with VCD export.
+
+Description:
+    A ``Tracer`` attached to a board records every change of the pin
+    levels, LED intensities, DAC values and timer channel pulse widths,
+    together with the simulated time of the change.
+
+    The trace is stored column wise in a directory:
+
+        times.col     int64 timestamps in microseconds ('q')
+        signals.col   uint32 signal numbers ('I')
+        values.col    float64 values ('d')
+        signals.txt   one '<name> <kind>' line per signal number
+
+    Changes are collected in memory and appended to the column files in
+    batches. ``TraceReader`` maps the column files into memory, so
+    traces larger than the memory can be read back and exported to the
+    Value Change Dump (VCD) format of waveform viewers.
+
+Usage:
+    tracer = Tracer('trace', board)
+    # run the firmware script
+    tracer.close()
+
+    with TraceReader('trace') as reader:
+        reader.to_vcd('trace.vcd')
+
+"""
+
+# ======================================================================
+# ========================= Import Statements ==========================
+# ======================================================================
+
+# # Built-in Imports:
+import mmap
+import os
+from array import array
+
+# # Package Imports:
+from .pyboard import current_board
+
+# ======================================================================
+# ============================== Classes ===============================
+# ======================================================================
+
+# Column files and their array typecodes
+COLUMNS = (('times.col', 'q'), ('signals.col', 'I'), ('values.col', 'd'))
+
+# VCD variable type of each signal kind
+WIRE = 'wire'
+REAL = 'real'
+
+
+class Tracer:
+    """Records output state changes of a board into column files."""
+
+    def __init__(self, directory, board=None, batch_size=65536):
+        """
+
+        Parameters
+        ----------
+        directory: str
+            Directory of the trace, created if needed. An existing trace
+            in it is replaced.
+        board: Board, optional
+            Defaults to the current board.
+        batch_size: int
+            Number of changes kept in memory before they are written.
+        """
+        self.directory = directory
+        self.board = board if board is not None else current_board()
+        self.batch_size = batch_size
+
+        os.makedirs(directory, exist_ok=True)
+        self._files = [
+            open(os.path.join(directory, filename), 'wb')
+            for filename, typecode in COLUMNS
+        ]
+        self._clock = self.board.clock
+        self._times = array('q')
+        self._signals = array('I')
+        self._values = array('d')
+
+        self._index = {}
+        self._names = []
+        self._kinds = []
+
+        self.board.tracer = self
+
+    def change(self, name, value):
+        """Record the new value of a signal at the current time.
+
+        Parameters
+        ----------
+        name: str
+            Signal name, e.g. 'pin.X1' or 'led.1'.
+        value: bool, int or float
+            Booleans make the signal a one bit wire.
+        """
+        index = self._index.get(name)
+        if index is None:
+            index = self._index[name] = len(self._names)
+            self._names.append(name)
+            self._kinds.append(WIRE if isinstance(value, bool) else REAL)
+
+        self._times.append(self._clock.micros())
+        self._signals.append(index)
+        self._values.append(value)
+        if len(self._times) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Append the collected changes to the column files."""
+        for column, stream in zip(
+                (self._times, self._signals, self._values), self._files):
+            column.tofile(stream)
+            stream.flush()
+            del column[:]
+
+        with open(os.path.join(self.directory, 'signals.txt'), 'w') as stream:
+            for name, kind in zip(self._names, self._kinds):
+                stream.write('{} {}\n'.format(name, kind))
+
+    def close(self):
+        """Write the remaining changes and detach from the board."""
+        if self.board.tracer is self:
+            self.board.tracer = None
+        if self._files:
+            self.flush()
+            for stream in self._files:
+                stream.close()
+            self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class TraceReader:
+    """Reads a trace written by ``Tracer``.
+
+    The columns (``times``, ``signals`` and ``values``) are memoryviews
+    of the mapped files.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+        self.names = []
+        self.kinds = []
+        with open(os.path.join(directory, 'signals.txt')) as stream:
+            for line in stream:
+                name, kind = line.split()
+                self.names.append(name)
+                self.kinds.append(kind)
+
+        self._maps = []
+        self.times, self.signals, self.values = [
+            self._column(filename, typecode)
+            for filename, typecode in COLUMNS
+        ]
+
+    def _column(self, filename, typecode):
+        with open(os.path.join(self.directory, filename), 'rb') as stream:
+            if not os.fstat(stream.fileno()).st_size:
+                return memoryview(b'').cast(typecode)
+            mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return memoryview(mapped).cast(typecode)
+
+    def __len__(self):
+        return len(self.times)
+
+    def changes(self, name=None):
+        """Generate the (time_us, name, value) changes, in time order.
+
+        Parameters
+        ----------
+        name: str, optional
+            Only generate the changes of this signal.
+        """
+        names = self.names
+        wanted = None if name is None else names.index(name)
+        for time_us, index, value in zip(
+                self.times, self.signals, self.values):
+            if wanted is None or index == wanted:
+                yield time_us, names[index], value
+
+    def to_vcd(self, path_or_file, timescale='1 us', chunk_size=65536):
+        """Export the trace in the Value Change Dump format.
+
+        Parameters
+        ----------
+        path_or_file: str or file
+            Output path, or a text file to write to.
+        timescale: str
+            Unit of the trace timestamps (microseconds).
+        chunk_size: int
+            Number of changes converted at once.
+        """
+        if isinstance(path_or_file, str):
+            with open(path_or_file, 'w') as stream:
+                return self.to_vcd(stream, timescale, chunk_size)
+        stream = path_or_file
+
+        codes = [_vcd_code(index) for index in range(len(self.names))]
+        stream.write('$timescale {} $end\n'.format(timescale))
+        stream.write('$scope module pyboard $end\n')
+        for name, kind, code in zip(self.names, self.kinds, codes):
+            width = 1 if kind == WIRE else 64
+            stream.write('$var {} {} {} {} $end\n'.format(
+                kind, width, code, name))
+        stream.write('$upscope $end\n$enddefinitions $end\n')
+
+        kinds = [kind == WIRE for kind in self.kinds]
+        last_time = None
+        for start in range(0, len(self.times), chunk_size):
+            lines = []
+            stop = start + chunk_size
+            for time_us, index, value in zip(
+                    self.times[start:stop], self.signals[start:stop],
+                    self.values[start:stop]):
+                if time_us != last_time:
+                    lines.append('#{}\n'.format(time_us))
+                    last_time = time_us
+                if kinds[index]:
+                    lines.append('{}{}\n'.format(
+                        1 if value else 0, codes[index]))
+                else:
+                    lines.append('r{:.16g} {}\n'.format(value, codes[index]))
+            stream.write(''.join(lines))
+
+    def close(self):
+        """Unmap the column files."""
+        for column in (self.times, self.signals, self.values):
+            column.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# ======================================================================
+# ============================= Functions ==============================
+# ======================================================================
+
+def _vcd_code(index):
+    """Return the VCD identifier code of a signal number."""
+    code = ''
+    while True:
+        index, digit = divmod(index, 94)
+        code += chr(33 + digit)
+        if not index:
+            return code